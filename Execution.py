@@ -1,18 +1,27 @@
-import cv2
 from FlowFreePuzzleSolver import FlowFreeSolver
-from test import ColorGridDetector
+from test import ColorGridDetector, square_size
 
 
 def main():
-    detector = ColorGridDetector(grid_size=(5, 5))
+    detector = ColorGridDetector()
     image_path = "examples/IMG_5927.PNG"
 
     color_positions = detector.detect_colors(image_path)
 
+    if detector.geometry is None:
+        return
+
+    print(f"Detected {detector.geometry.rows}x{detector.geometry.cols} board")
     print("Detected Color Positions:")
     print(color_positions)
 
-    solver = FlowFreeSolver(5, color_positions)
+    try:
+        size = square_size(detector.geometry)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    solver = FlowFreeSolver(size, color_positions)
 
     if solver.solve():
         print("✅ Solution found:")
@@ -20,5 +29,7 @@ def main():
     else:
         print("❌ No solution found.")
 
+    print(f"Nodes: {solver.nodes}, pruned: {solver.pruned}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,142 @@
-from copy import deepcopy
+import random
+import time
+from collections import OrderedDict, namedtuple
 
 DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
+BACKENDS = ('dfs', 'sat')
+
+# 'fixed' routes colors one after another in input order, 'mrv' always extends
+# the path head with the fewest legal moves
+ORDERINGS = ('fixed', 'mrv')
+
+# Outcome of solve_budgeted. grid is the solution when solved, the fullest
+# partial board seen when the budget ran out or the solve was cancelled, and
+# None when the puzzle has no solution.
+SolveResult = namedtuple('SolveResult', ['status', 'grid', 'nodes', 'seconds'])
+SOLVED, UNSOLVABLE, TIMEOUT, CANCELLED = 'solved', 'unsolvable', 'timeout', 'cancelled'
+
+# Kinds of frame on the dfs stack: moves still to try at one node, or
+# independent parts of the board being solved one after another
+MOVES, PARTS = 0, 1
+
+class TranspositionTable:
+    """Bounded store of board hashes already proven dead, evicting the least recently used."""
+
+    def __init__(self, max_entries):
+        """
+        Args:
+            max_entries (int): Maximum number of hashes kept. Each entry costs roughly 100 bytes.
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        self.entries[key] = None
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+class SolveStats:
+    """
+    Search counters collected by FlowFreeSolver when passed as stats=.
+
+    The solver only instruments itself when a SolveStats is given, so plain
+    solves pay nothing for it.
+    """
+
+    def __init__(self, on_node=None):
+        """
+        Args:
+            on_node (callable): Called as on_node(solver, depth) at every expanded node. Defaults to None.
+        """
+        self.on_node = on_node
+        self.colors = []
+        self.nodes = 0
+        self.nodes_per_color = []
+        self.backtracks_per_color = []
+        self.depth = 0
+        self.max_depth = 0
+        self.dead_ends = 0
+        self.tt_pruned = 0
+        self.moves_seconds = 0.0
+        self.complete_checks = 0
+        self.complete_seconds = 0.0
+        self.seconds = 0.0
+
+    def reset(self, colors):
+        self.__init__(self.on_node)
+        self.colors = list(colors)
+        self.nodes_per_color = [0] * len(colors)
+        self.backtracks_per_color = [0] * len(colors)
+
+    def merge(self, counters):
+        """Adds the counters of an as_dict() result from a worker process, except nodes."""
+        self.max_depth = max(self.max_depth, counters['max_depth'])
+        self.dead_ends += counters['dead_ends']
+        self.tt_pruned += counters['tt_pruned']
+        self.moves_seconds += counters['moves_seconds']
+        self.complete_checks += counters['complete_checks']
+        self.complete_seconds += counters['complete_seconds']
+        for k, color in enumerate(self.colors):
+            self.nodes_per_color[k] += counters['nodes_per_color'].get(color, 0)
+            self.backtracks_per_color[k] += counters['backtracks_per_color'].get(color, 0)
+
+    def as_dict(self):
+        """Returns the counters as plain values, ready to export."""
+        return {
+            'nodes': self.nodes,
+            'nodes_per_color': dict(zip(self.colors, self.nodes_per_color)),
+            'backtracks': sum(self.backtracks_per_color),
+            'backtracks_per_color': dict(zip(self.colors, self.backtracks_per_color)),
+            'max_depth': self.max_depth,
+            'dead_ends': self.dead_ends,
+            'tt_pruned': self.tt_pruned,
+            'moves_seconds': self.moves_seconds,
+            'complete_checks': self.complete_checks,
+            'complete_seconds': self.complete_seconds,
+            'seconds': self.seconds,
+        }
+
+
 class FlowFreeSolver:
-    def __init__(self, size, color_positions):
+    def __init__(self, size, color_positions, propagate=True, backend='dfs', ordering='fixed',
+                 tt_size=200000, solution_cache=None, stats=None, decompose=True):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown ordering {ordering!r}, expected one of {ORDERINGS}")
         self.size = size
+        self.propagate = propagate
+        # Split the board into independent parts when the search cuts it up
+        self.decompose = decompose and propagate
+        self.backend = backend
+        self.ordering = ordering
+        # Optional solutionCache.SolutionCache consulted before searching
+        self.solution_cache = solution_cache
+        # Optional SolveStats filled in by solve()
+        self.stats = stats
         # Filter out colors with no detected positions
         self.color_positions = {
             color: positions for color, positions in color_positions.items() if positions
@@ -19,54 +151,793 @@ class FlowFreeSolver:
             self.grid[end[0]][end[1]] = color
             self.endpoints.add(start)
 
+        # Bitboard state: cell (x, y) is bit x * size + y
+        self.full_mask = (1 << (size * size)) - 1
+        self.adjacent = [self._adjacent_cells(i) for i in range(size * size)]
+        self.neighbors = [self._neighbor_mask(i) for i in range(size * size)]
+
+        self.colors = list(self.color_positions)
+        self.starts = [self.index(*start) for start, _ in self.color_positions.values()]
+        self.ends = [self.index(*end) for _, end in self.color_positions.values()]
+        self.color_masks = [(1 << s) | (1 << e) for s, e in zip(self.starts, self.ends)]
+        self.occupied = 0
+        for mask in self.color_masks:
+            self.occupied |= mask
+
+        # Shift masks used to move a whole bitboard one cell sideways
+        left_col = sum(1 << self.index(x, 0) for x in range(size))
+        right_col = sum(1 << self.index(x, size - 1) for x in range(size))
+        self.not_left_col = self.full_mask & ~left_col
+        self.not_right_col = self.full_mask & ~right_col
+
+        # Each color is routed from its start; heads[k] is the current path tip.
+        # active lists the unfinished colors and open_mask holds their heads and ends.
+        self.heads = list(self.starts)
+        self.active = list(range(len(self.colors)))
+        self.open_mask = self.occupied
+
+        # Zobrist hash of (occupancy, head of every unfinished color); a dead
+        # partial board stays dead however the search reached it
+        keys = random.Random(len(self.colors) * size)
+        self.cell_keys = [keys.getrandbits(64) for _ in range(size * size)]
+        self.head_keys = [[keys.getrandbits(64) for _ in range(size * size)] for _ in self.colors]
+        self.hash = 0
+        for i in range(size * size):
+            if self.occupied >> i & 1:
+                self.hash ^= self.cell_keys[i]
+        for k in self.active:
+            self.hash ^= self.head_keys[k][self.heads[k]]
+        self.dead_states = TranspositionTable(tt_size) if tt_size else None
+
+        # Cells the search must fill; narrowed while one independent part is searched.
+        # parked counts the unfinished colors set aside meanwhile.
+        self.scope = self.full_mask
+        self.parked = 0
+        # (region mask, colors that can route through it) for every empty region, from _propagate
+        self.regions = []
+
+        # Search counters
+        self.nodes = 0
+        self.pruned = 0
+
+        # Optional callable polled every 1024 nodes; returning True pauses the search
+        self.stop = None
+        self.stopped = False
+        # dfs frames of a paused search, see dfs()
+        self._stack = []
+        self.paused = False
+
+    def index(self, x, y):
+        return x * self.size + y
+
+    def _adjacent_cells(self, i):
+        # (cell, bit) pairs in DIRECTIONS order
+        x, y = divmod(i, self.size)
+        cells = []
+        for dx, dy in DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < self.size and 0 <= ny < self.size:
+                j = self.index(nx, ny)
+                cells.append((j, 1 << j))
+        return cells
+
+    def _neighbor_mask(self, i):
+        mask = 0
+        for _, bit in self.adjacent[i]:
+            mask |= bit
+        return mask
+
     def is_valid(self, x, y, target):
         # Valid if within bounds, empty or it's the target
         return (0 <= x < self.size and 0 <= y < self.size and
-                (self.grid[x][y] is None or (x, y) == target))
+                (not self.occupied >> self.index(x, y) & 1 or (x, y) == target))
 
-    def solve(self):
-        colors = list(self.color_positions.keys())
-        return self.backtrack(colors, 0)
+    def solve(self, workers=1, profiler=None):
+        """
+        Searches for a solution and writes it into self.grid.
 
-    def backtrack(self, colors, index):
-        if index == len(colors):
-            return self.is_complete()
+        With a solution_cache, known puzzles (in any rotation, mirror or color
+        naming) are answered from the cache and new results are added to it.
 
-        color = colors[index]
-        start, end = self.color_positions[color]
-        return self.dfs(start[0], start[1], end, color, set(), colors, index)
+        Args:
+            workers (int): Processes for the dfs backend; more than 1 uses parallelSolver.solve_parallel.
+            profiler: Context manager entered around the search, e.g. cProfile.Profile()
+                or a sampling profiler. Defaults to None.
 
-    def dfs(self, x, y, end, color, visited, colors, index):
-        if (x, y) == end:
-            return self.backtrack(colors, index + 1)
+        Returns:
+            bool: True if a solution was found.
+        """
+        if self.solution_cache is not None:
+            cached = self.solution_cache.get(self.size, self.color_positions)
+            if cached is not None:
+                solved, grid = cached
+                if solved:
+                    self.grid = grid
+                return solved
 
-        visited.add((x, y))
-        for dx, dy in DIRECTIONS:
-            nx, ny = x + dx, y + dy
-            if self.is_valid(nx, ny, end) and (nx, ny) not in visited:
-                # Save previous value to backtrack
-                prev = self.grid[nx][ny]
-                if (nx, ny) != end:
-                    self.grid[nx][ny] = color
+        if self.stats is not None:
+            # A resumed search keeps adding to the counters of the slices before it
+            if not self.paused or self.stats.colors != self.colors:
+                self.stats.reset(self.colors)
+                self.stats.depth = self.stats.max_depth = self._moves_made()
+                self._instrument(self.stats)
+            nodes = self.nodes
+            tt_hits = self.dead_states.hits if self.dead_states is not None else 0
+            start = time.perf_counter()
+        if profiler is not None:
+            with profiler:
+                solved = self._search(workers)
+        else:
+            solved = self._search(workers)
+        if self.stats is not None:
+            self.stats.seconds += time.perf_counter() - start
+            # Worker processes add their nodes to self.nodes and their other counters to stats
+            self.stats.nodes += self.nodes - nodes
+            if self.dead_states is not None:
+                self.stats.tt_pruned += self.dead_states.hits - tt_hits
+        if self.solution_cache is not None and not self.stopped:
+            self.solution_cache.put(self.size, self.color_positions, self.grid if solved else None)
+        return solved
+
+    def _search(self, workers):
+        if self.backend == 'sat':
+            return self._solve_sat()
+        if workers != 1:
+            from parallelSolver import solve_parallel
 
-                if self.dfs(nx, ny, end, color, visited, colors, index):
-                    return True
+            return solve_parallel(self, workers)
+        if self.dfs():
+            self._write_grid()
+            return True
+        return False
+
+    def _solve_sat(self):
+        from satSolver import SatFlowSolver
 
-                if (nx, ny) != end:
-                    self.grid[nx][ny] = prev
+        sat = SatFlowSolver(self.size, self.color_positions)
+        # SAT conflicts stand in for search nodes
+        nodes = self.nodes
+        if self.stop is not None:
+            def stop():
+                self.nodes = nodes + sat.sat.conflicts
+                return self.stop()
 
-        visited.remove((x, y))
+            sat.sat.stop = stop
+        result = sat.solve()
+        self.nodes = nodes + sat.sat.conflicts
+        if result is None:
+            self.stopped = True
+            return False
+        if result:
+            self.grid = sat.grid
+            return True
         return False
 
+    def count_solutions(self, limit=None):
+        """
+        Counts the puzzle's solutions with solutionCounter's frontier DP.
+
+        Args:
+            limit (int): Stop counting at this many; 2 is enough to check uniqueness.
+
+        Returns:
+            int: Number of solutions, capped at limit.
+        """
+        from solutionCounter import count_solutions
+
+        return count_solutions(self.size, self.color_positions, limit)[0]
+
+    def solve_budgeted(self, timeout=None, deadline=None, node_limit=None, cancel=None,
+                       on_progress=None, progress_interval=1.0):
+        """
+        Solves within a time and node budget, giving up cleanly when it runs out.
+
+        The budget is checked every 1024 search nodes (256 conflicts for the sat
+        backend), so limits are honoured to within one such batch. The search
+        is serial. A dfs search that runs out of budget is paused where it
+        stopped, and solving again with a fresh budget resumes it.
+
+        Args:
+            timeout (float): Seconds allowed. Defaults to None.
+            deadline (float): Absolute time.monotonic() value to stop at. Defaults to None.
+            node_limit (int): Search nodes allowed in this call. Defaults to None.
+            cancel: Object with is_set(), such as threading.Event; setting it cancels the solve.
+            on_progress (callable): Called with a dict of nodes, nodes_per_sec, depth,
+                best_depth and elapsed every progress_interval seconds.
+            progress_interval (float): Seconds between progress events.
+
+        Returns:
+            SolveResult: status is SOLVED, UNSOLVABLE, TIMEOUT or CANCELLED.
+        """
+        start = time.monotonic()
+        if timeout is not None:
+            deadline = start + timeout if deadline is None else min(deadline, start + timeout)
+        initial = bin(self.occupied).count('1') + len(self.colors) - len(self.active) - self.parked
+        outcome = {'status': TIMEOUT, 'best': None, 'best_depth': -1}
+        nodes = self.nodes
+        last_event = [start, nodes]
+
+        def stop():
+            now = time.monotonic()
+            # Keep the fullest board seen so far to return if the budget runs out
+            depth = bin(self.occupied).count('1') + len(self.colors) - len(self.active) - self.parked - initial
+            if depth > outcome['best_depth']:
+                outcome['best'] = tuple(self.color_masks)
+                outcome['best_depth'] = depth
+            if on_progress is not None and now - last_event[0] >= progress_interval:
+                on_progress({
+                    'nodes': self.nodes - nodes,
+                    'nodes_per_sec': (self.nodes - last_event[1]) / (now - last_event[0]),
+                    'depth': depth,
+                    'best_depth': outcome['best_depth'],
+                    'elapsed': now - start,
+                })
+                last_event[:] = [now, self.nodes]
+            if cancel is not None and cancel.is_set():
+                outcome['status'] = CANCELLED
+                return True
+            return ((deadline is not None and now >= deadline)
+                    or (node_limit is not None and self.nodes - nodes >= node_limit))
+
+        previous, self.stop, self.stopped = self.stop, stop, False
+        try:
+            solved = self.solve()
+        finally:
+            self.stop = previous
+        seconds = time.monotonic() - start
+        nodes = self.nodes - nodes
+
+        if solved:
+            return SolveResult(SOLVED, self.grid, nodes, seconds)
+        if not self.stopped:
+            return SolveResult(UNSOLVABLE, None, nodes, seconds)
+        masks = outcome['best'] if outcome['best'] is not None else self.color_masks
+        return SolveResult(outcome['status'], self._grid_from_masks(masks), nodes, seconds)
+
+    def dfs(self):
+        """
+        Searches depth first from the current state, or resumes a paused search.
+
+        The search is a loop over an explicit stack rather than recursion, so
+        board size doesn't run into the interpreter's recursion limit. Each
+        frame holds the moves left to try at one node and the undo record of
+        the move being explored, so backtracking undoes exactly the cells
+        that move wrote. When the stop hook fires the stack is kept and
+        the search is paused; calling dfs again carries on from there.
+
+        Returns:
+            bool: True if solved, with the solution left on the board. False if
+                there is no solution, or if the search was stopped (see paused).
+        """
+        stack = self._stack
+        # A paused search stopped on entering a node it has already counted
+        count = not self.paused
+        self.paused = self.stopped = False
+        dead, stop = self.dead_states, self.stop
+        advance, retreat, next_moves = self._advance, self._retreat, self._next_moves
+        result = False
+        descend = True
+
+        while True:
+            if descend:
+                descend = False
+                if count:
+                    self.nodes += 1
+                    if stop is not None and not self.nodes & 1023 and stop():
+                        self.stopped = self.paused = True
+                        return False
+                count = True
+
+                if not self.active:
+                    result = self.is_complete()
+                elif dead is not None and self.hash in dead:
+                    result = False
+                else:
+                    step = next_moves()
+                    if step is None:
+                        self.pruned += 1
+                        result = False
+                    else:
+                        parts = self._independent_parts() if self.decompose and len(self.regions) > 1 else None
+                        if parts is not None:
+                            # Smallest first, so an impossible part is found cheaply
+                            parts.sort(key=lambda part: part[0].bit_count())
+                            frame = [PARTS, self.snapshot(), self.active, self.scope, self.parked, parts, 0]
+                            stack.append(frame)
+                            self._enter_part(frame)
+                            descend = True
+                            continue
+                        stack.append([MOVES, step[0], step[1], 0, None])
+                        result = False
+
+            # The node below the top frame has finished with result
+            if not stack:
+                return result
+            frame = stack[-1]
+            if frame[0] == MOVES:
+                if result:
+                    # Solved: keep the move on the board
+                    stack.pop()
+                    continue
+                _, k, moves, i, undo = frame
+                if undo is not None:
+                    retreat(k, undo)
+                if i < len(moves):
+                    frame[3] = i + 1
+                    frame[4] = advance(k, moves[i][0])
+                    descend = True
+                else:
+                    stack.pop()
+                    if dead is not None:
+                        dead.add(self.hash)
+            elif result and frame[6] < len(frame[5]):
+                self._enter_part(frame)
+                descend = True
+            else:
+                stack.pop()
+                _, state, _, self.scope, self.parked, _, _ = frame
+                if result:
+                    self.active = []
+                else:
+                    # One part has no solution, so neither has the whole; drop the parts already solved
+                    self._unwind(state)
+                    if dead is not None:
+                        dead.add(self.hash)
+
+    def _enter_part(self, frame):
+        """Sets up the search of the next part of a PARTS frame, parking the other parts' colors."""
+        _, _, active, _, parked, parts, i = frame
+        cells, colors = parts[i]
+        frame[6] = i + 1
+        self.active = [k for k in active if k in colors]
+        self.scope = cells
+        self.parked = parked + len(active) - len(self.active)
+
+    def abandon(self):
+        """Drops a paused search, undoing its moves so the board is back where dfs started."""
+        while self._stack:
+            frame = self._stack.pop()
+            if frame[0] == MOVES:
+                if frame[4] is not None:
+                    self._retreat(frame[1], frame[4])
+            else:
+                _, state, _, self.scope, self.parked, _, _ = frame
+                self._unwind(state)
+        self.paused = self.stopped = False
+
+    def checkpoint(self):
+        """
+        Returns a paused search as a picklable value for load_checkpoint().
+
+        It holds the current board and the search stack, which records every
+        node still to be explored, so a long solve can be saved and resumed
+        in another process. The transposition table isn't saved, so the
+        resumed search may prove some dead states again.
+        """
+        frames = []
+        for frame in self._stack:
+            if frame[0] == MOVES:
+                frames.append(list(frame))
+            else:
+                _, state, active, scope, parked, parts, i = frame
+                frames.append([PARTS, state, tuple(active), scope, parked,
+                               [(cells, frozenset(colors)) for cells, colors in parts], i])
+        return {
+            'state': self.snapshot(),
+            'scope': self.scope,
+            'parked': self.parked,
+            'paused': self.paused,
+            'nodes': self.nodes,
+            'frames': frames,
+        }
+
+    def load_checkpoint(self, checkpoint):
+        """Restores a search saved by checkpoint(); the next solve() or dfs() resumes it."""
+        self.restore(checkpoint['state'])
+        self.scope = checkpoint['scope']
+        self.parked = checkpoint['parked']
+        self.paused = checkpoint['paused']
+        self.nodes = checkpoint['nodes']
+        self._stack = []
+        for frame in checkpoint['frames']:
+            frame = list(frame)
+            if frame[0] == PARTS:
+                frame[2] = list(frame[2])
+            self._stack.append(frame)
+
+    def _independent_parts(self):
+        """
+        Groups the empty regions and unfinished colors into parts no color crosses.
+
+        A path runs through one empty region at most, so regions are only
+        tied together by colors that could use either. Colors that can only
+        step straight into their end form parts of their own.
+
+        Returns:
+            list: (cell mask, set of colors) per part, or None if there is only one.
+        """
+        parts = []
+        for region, colors in self.regions:
+            cells, colors = region, set(colors)
+            for part in [part for part in parts if part[1] & colors]:
+                parts.remove(part)
+                cells |= part[0]
+                colors |= part[1]
+            parts.append((cells, colors))
+        placed = set().union(*(colors for _, colors in parts))
+        parts.extend((0, {k}) for k in self.active if k not in placed)
+        return parts if len(parts) > 1 else None
+
+    def _instrument(self, stats):
+        """Wraps the search steps in instance attributes that update stats."""
+        next_moves = type(self)._next_moves.__get__(self)
+        advance = type(self)._advance.__get__(self)
+        retreat = type(self)._retreat.__get__(self)
+        unwind = type(self)._unwind.__get__(self)
+        is_complete = type(self).is_complete.__get__(self)
+
+        def counted_next_moves():
+            if stats.on_node is not None:
+                stats.on_node(self, stats.depth)
+            start = time.perf_counter()
+            step = next_moves()
+            stats.moves_seconds += time.perf_counter() - start
+            if step is None:
+                stats.dead_ends += 1
+            else:
+                stats.nodes_per_color[step[0]] += 1
+            return step
+
+        def counted_advance(k, cell):
+            stats.depth += 1
+            if stats.depth > stats.max_depth:
+                stats.max_depth = stats.depth
+            return advance(k, cell)
+
+        def counted_retreat(k, undo):
+            stats.depth -= 1
+            stats.backtracks_per_color[k] += 1
+            retreat(k, undo)
+
+        def counted_unwind(state):
+            # Every move made since state is undone at once, so count each as a backtrack
+            _, color_masks, _, _, open_mask, _ = state
+            for k, mask in enumerate(color_masks):
+                # A color's end leaves open_mask when the step finishing it is made
+                end = 1 << self.ends[k]
+                finished = bool(open_mask & end) and not self.open_mask & end
+                dropped = (self.color_masks[k] ^ mask).bit_count() + finished
+                stats.depth -= dropped
+                stats.backtracks_per_color[k] += dropped
+            unwind(state)
+
+        def timed_is_complete():
+            stats.complete_checks += 1
+            start = time.perf_counter()
+            complete = is_complete()
+            stats.complete_seconds += time.perf_counter() - start
+            return complete
+
+        self._next_moves = counted_next_moves
+        self._advance = counted_advance
+        self._retreat = counted_retreat
+        self._unwind = counted_unwind
+        self.is_complete = timed_is_complete
+
+    def _next_moves(self):
+        """Returns (color index, ordered list of (cell, bit) moves), or None if the state is dead."""
+        empty = self.scope & ~self.occupied
+        if self.propagate:
+            choice = self._propagate(empty)
+        else:
+            choice = self._choose(empty, None)
+        if choice is None:
+            return None
+        k, moves = choice
+        return k, self._ordered_moves(self.heads[k], moves, 1 << self.ends[k], empty)
+
+    def _advance(self, k, cell):
+        """Moves color k's head into cell and returns what _retreat needs to undo it."""
+        head = self.heads[k]
+        bit = 1 << cell
+        if cell == self.ends[k]:
+            # Path reaches its end: the color is finished
+            position = self.active.index(k)
+            del self.active[position]
+            self.open_mask ^= (1 << head) | bit
+            self.hash ^= self.head_keys[k][head]
+            return head, position
+
+        self.occupied |= bit
+        self.color_masks[k] |= bit
+        self.heads[k] = cell
+        self.open_mask ^= (1 << head) | bit
+        self.hash ^= self.cell_keys[cell] ^ self.head_keys[k][head] ^ self.head_keys[k][cell]
+        return head, None
+
+    def _retreat(self, k, undo):
+        head, position = undo
+        if position is not None:
+            self.active.insert(position, k)
+            self.open_mask ^= (1 << head) | (1 << self.ends[k])
+            self.hash ^= self.head_keys[k][head]
+            return
+
+        # Clear the cell to backtrack
+        cell = self.heads[k]
+        bit = 1 << cell
+        self.occupied ^= bit
+        self.color_masks[k] ^= bit
+        self.heads[k] = head
+        self.open_mask ^= (1 << head) | bit
+        self.hash ^= self.cell_keys[cell] ^ self.head_keys[k][head] ^ self.head_keys[k][cell]
+
+    def _moves_made(self):
+        """Number of moves on the board: cells added to paths plus colors finished."""
+        cells = sum(mask.bit_count() - 2 for mask in self.color_masks)
+        return cells + sum(1 for end in self.ends if not self.open_mask >> end & 1)
+
+    def _unwind(self, state):
+        """Undoes every move made since state was taken with snapshot()."""
+        self.restore(state)
+
+    def snapshot(self):
+        """Returns the search state as a picklable tuple for restore()."""
+        return (self.occupied, tuple(self.color_masks), tuple(self.heads),
+                tuple(self.active), self.open_mask, self.hash)
+
+    def restore(self, state):
+        occupied, color_masks, heads, active, open_mask, state_hash = state
+        self.occupied = occupied
+        self.color_masks = list(color_masks)
+        self.heads = list(heads)
+        self.active = list(active)
+        self.open_mask = open_mask
+        self.hash = state_hash
+
+    def expand(self):
+        """Returns snapshots of the children of the current state, in the order dfs visits them."""
+        if not self.active:
+            return []
+        step = self._next_moves()
+        if step is None:
+            return []
+        k, moves = step
+        children = []
+        for cell, _ in moves:
+            undo = self._advance(k, cell)
+            children.append(self.snapshot())
+            self._retreat(k, undo)
+        return children
+
+    def _choose(self, empty, three_free):
+        """
+        Picks the color to extend next.
+
+        Args:
+            empty (int): Mask of the empty cells.
+            three_free (int): Cells with at least three free neighbors, or None to skip forced moves.
+
+        Returns:
+            tuple: (color index, mask of its legal moves), or None if some head is stuck.
+        """
+        mrv = self.ordering == 'mrv'
+        # Forced moves are looked for at every head; the ordering only picks the color to branch on
+        candidates = self.active if mrv or three_free is not None else self.active[:1]
+        best = None
+        for k in candidates:
+            head = self.heads[k]
+            moves = self.neighbors[head] & (empty | (1 << self.ends[k]))
+            if three_free is not None:
+                # An empty cell next to the head with only two free
+                # neighbors has to be entered from the head
+                forced = self.neighbors[head] & empty & ~three_free
+                if forced & (forced - 1):
+                    return None
+                if forced:
+                    moves = forced
+            count = moves.bit_count()
+            if count == 0:
+                return None
+            if count == 1:
+                return k, moves
+            if best is None or mrv and count < best[0]:
+                best = (count, k, moves)
+        return best[1], best[2]
+
+    def _ordered_moves(self, head, moves, end_bit, empty):
+        moves = [(cell, bit) for cell, bit in self.adjacent[head] if moves & bit]
+        if self.ordering == 'mrv':
+            # Finish the path first, then hug walls and other paths
+            moves.sort(key=lambda move: (move[1] != end_bit,
+                                         (self.neighbors[move[0]] & empty).bit_count()))
+        return moves
+
+    def _shifts(self, mask):
+        # One mask per direction of the cells whose neighbor that way is in mask
+        return ((mask >> self.size),
+                (mask << self.size) & self.full_mask,
+                (mask >> 1) & self.not_right_col,
+                (mask << 1) & self.not_left_col)
+
+    def _expand(self, mask):
+        up, down, left, right = self._shifts(mask)
+        return mask | up | down | left | right
+
+    def _flood(self, seed, within):
+        # _expand inlined, with the column masks cut down to within once: this is the search's hottest loop
+        size = self.size
+        not_right, not_left = self.not_right_col & within, self.not_left_col & within
+        region = seed
+        while True:
+            grown = ((region | region >> size | region << size) & within
+                     | (region >> 1) & not_right | (region << 1) & not_left)
+            if grown == region:
+                return region
+            region = grown
+
+    def _propagate(self, empty):
+        """
+        Checks the current partial board for states that can never be completed.
+
+        Args:
+            empty (int): Mask of the empty cells.
+
+        Returns:
+            tuple: (color index, mask of its legal moves) as from _choose, or None if the state is dead.
+        """
+        # Cells a path can still attach to: empty cells plus unfinished heads and ends
+        free = empty | self.open_mask
+
+        # Dead ends: every empty cell will need two free neighbors
+        a, b, c, d = self._shifts(free)
+        two_free = (a & b) | (a & c) | (a & d) | (b & c) | (b & d) | (c & d)
+        if empty & ~two_free:
+            return None
+
+        # Unfinished colors as masks of their head and end cells
+        active, heads, ends, neighbors = self.active, self.heads, self.ends, self.neighbors
+        open_colors = [(1 << heads[k]) | (1 << ends[k]) for k in active]
+        connected = [bool(neighbors[heads[k]] >> ends[k] & 1) for k in active]
+
+        # Every empty region must be enterable and leavable by one unfinished color,
+        # and every unfinished head must still reach its end through some region
+        self.regions = regions = []
+        remaining = empty
+        while remaining:
+            region = self._flood(remaining & -remaining, empty)
+            remaining &= ~region
+            border = self._expand(region)
+            through = [k for k, pair in enumerate(open_colors) if border & pair == pair]
+            if not through:
+                return None
+            for k in through:
+                connected[k] = True
+            regions.append((region, [active[k] for k in through]))
+        if not all(connected):
+            return None
+
+        three_free = (a & b & (c | d)) | (c & d & (a | b))
+        return self._choose(empty, three_free)
+
     def is_complete(self):
-        # All cells must be filled
-        return all(all(cell is not None for cell in row) for row in self.grid)
+        # All cells in scope must be filled
+        return self.occupied & self.scope == self.scope
+
+    def _grid_from_masks(self, color_masks):
+        """Returns a new grid with each color's cells filled in and None elsewhere."""
+        grid = [[None for _ in range(self.size)] for _ in range(self.size)]
+        for color, mask in zip(self.colors, color_masks):
+            for i in range(self.size * self.size):
+                if mask >> i & 1:
+                    x, y = divmod(i, self.size)
+                    grid[x][y] = color
+        return grid
+
+    def _write_grid(self):
+        for color, mask in zip(self.colors, self.color_masks):
+            for i in range(self.size * self.size):
+                if mask >> i & 1:
+                    x, y = divmod(i, self.size)
+                    self.grid[x][y] = color
+
+    def format_grid(self, grid=None):
+        """Returns grid (default self.grid) as text, one letter per cell and '.' for empty cells."""
+        grid = self.grid if grid is None else grid
+        return "\n".join(" ".join(cell[0].upper() if cell else '.' for cell in row) for row in grid)
 
     def print_grid(self):
-        for row in self.grid:
-            print(" ".join(cell[0].upper() if cell else '.' for cell in row))
+        print(self.format_grid())
         print()
 
+def compare_orderings(size, color_positions):
+    """
+    Solves a puzzle with every search ordering and prints nodes and time side by side.
+
+    Returns:
+        dict: {'ordering': (solved, nodes, seconds)}
+    """
+    results = {}
+    for ordering in ORDERINGS:
+        solver = FlowFreeSolver(size, color_positions, ordering=ordering)
+        start = time.perf_counter()
+        solved = solver.solve()
+        results[ordering] = (solved, solver.nodes, time.perf_counter() - start)
+
+    print(f"{'ordering':<10}{'solved':>8}{'nodes':>12}{'seconds':>10}")
+    for ordering, (solved, nodes, seconds) in results.items():
+        print(f"{ordering:<10}{str(solved):>8}{nodes:>12}{seconds:>10.4f}")
+    return results
+
+def is_solution(size, color_positions, grid):
+    """
+    Checks that grid is a filled board where every color connects its two endpoints.
+
+    Args:
+        size (int): Width and height of the board.
+        color_positions (dict): {'color': [(row, col), (row, col)]}.
+        grid (list): size x size nested list of color names.
+
+    Returns:
+        bool: True if grid solves the puzzle.
+    """
+    color_positions = {color: positions for color, positions in color_positions.items() if positions}
+    if any(grid[x][y] not in color_positions for x in range(size) for y in range(size)):
+        return False
+
+    for color, (start, end) in color_positions.items():
+        if grid[start[0]][start[1]] != color or grid[end[0]][end[1]] != color:
+            return False
+        cells = {(x, y) for x in range(size) for y in range(size) if grid[x][y] == color}
+        reached = {tuple(start)}
+        stack = [tuple(start)]
+        while stack:
+            x, y = stack.pop()
+            for dx, dy in DIRECTIONS:
+                cell = (x + dx, y + dy)
+                if cell in cells and cell not in reached:
+                    reached.add(cell)
+                    stack.append(cell)
+        if reached != cells:
+            return False
+    return True
+
+def cross_check(size, color_positions):
+    """
+    Solves a puzzle with every backend and checks that they agree.
+
+    Returns:
+        bool: True if all backends agree on solvability and every returned grid is valid.
+    """
+    results = []
+    for backend in BACKENDS:
+        solver = FlowFreeSolver(size, color_positions, backend=backend)
+        solved = solver.solve()
+        if solved and not is_solution(size, color_positions, solver.grid):
+            return False
+        results.append(solved)
+    return len(set(results)) == 1
+
+def check_sliced_stats(size, color_positions, slice_nodes=5000, **options):
+    """
+    Checks that a search paused and resumed in node budgets reports the same stats as one run.
+
+    Returns:
+        bool: True if both runs end the same way with equal counters, timings aside.
+    """
+    counters = []
+    for budget in (None, slice_nodes):
+        stats = SolveStats()
+        solver = FlowFreeSolver(size, color_positions, stats=stats, **options)
+        result = solver.solve_budgeted(node_limit=budget)
+        while result.status == TIMEOUT:
+            result = solver.solve_budgeted(node_limit=budget)
+        counts = stats.as_dict()
+        for key in ('moves_seconds', 'complete_seconds', 'seconds'):
+            del counts[key]
+        counters.append((result.status, result.grid, stats.depth, counts))
+    return counters[0] == counters[1]
+
 if __name__ == "__main__":
     # Example usage with potential missing color (orange)
     detected_positions_example = {
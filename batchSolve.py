@@ -0,0 +1,210 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Solution caches opened by this worker process, by path
+_solution_caches = {}
+
+
+def iter_images(inputs):
+    """
+    Yields image paths from directories, glob patterns and plain file paths, lazily.
+
+    Args:
+        inputs (list): Directories, glob patterns or files.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            names = sorted(entry.name for entry in os.scandir(item) if entry.is_file())
+            for name in names:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(item, name)
+        elif os.path.isfile(item):
+            yield item
+        else:
+            for path in sorted(glob.iglob(item, recursive=True)):
+                if path.lower().endswith(IMAGE_EXTENSIONS):
+                    yield path
+
+
+def _detect(path, grid_size, cache_dir=None):
+    from test import ColorGridDetector, DetectionCache, square_size
+
+    start = time.perf_counter()
+    detector = ColorGridDetector(grid_size=(grid_size, grid_size) if grid_size else None,
+                                 cache=DetectionCache(directory=cache_dir) if cache_dir else None)
+    color_positions = detector.detect_colors(path)
+    if detector.geometry is None:
+        raise ValueError(f"could not read {path}")
+    square_size(detector.geometry)
+    return color_positions, tuple(detector.geometry), time.perf_counter() - start
+
+
+def _solve(color_positions, geometry, options, solution_cache=None, with_stats=False, budget=None,
+           path=None, render_dir=None):
+    from FlowFreePuzzleSolver import SOLVED, FlowFreeSolver, SolveStats
+    from createImage import render_many
+    from solutionCache import SolutionCache
+    from test import GridGeometry
+
+    start = time.perf_counter()
+    cache = None
+    if solution_cache:
+        cache = _solution_caches.get(solution_cache)
+        if cache is None:
+            cache = _solution_caches[solution_cache] = SolutionCache(solution_cache)
+    stats = SolveStats() if with_stats else None
+    geometry = GridGeometry(*geometry)
+    solver = FlowFreeSolver(geometry.rows, color_positions, solution_cache=cache, stats=stats, **options)
+    result = solver.solve_budgeted(**(budget or {}))
+    if render_dir and result.status == SOLVED:
+        render_many([(path, result.grid, solver.color_positions, geometry)], render_dir)
+    return (result.status, result.grid, result.nodes, time.perf_counter() - start,
+            stats.as_dict() if stats is not None else None)
+
+
+def run_batch(paths, output, grid_size=None, detect_workers=2, solve_workers=2, max_in_flight=64,
+              solver_options=None, cache_dir=None, solution_cache=None, with_stats=False,
+              timeout=None, node_limit=None, render_dir=None):
+    """
+    Streams images through detection and solving and writes one JSON line per image.
+
+    Detection and solving run in separate process pools, so one image can be
+    solved while the next ones are detected. At most max_in_flight images are
+    between the two stages at any time; new paths are only read once earlier
+    images finish, which keeps memory bounded on very large inputs.
+
+    Args:
+        paths (iterable): Image paths, consumed lazily.
+        output (file): Text stream the JSONL records are written to.
+        grid_size (int): Board width and height. Defaults to None, detecting it per image.
+        detect_workers (int): Processes running ColorGridDetector.
+        solve_workers (int): Processes running FlowFreeSolver.
+        max_in_flight (int): Images allowed between reading and writing.
+        solver_options (dict): Extra FlowFreeSolver keyword arguments.
+        cache_dir (str): Directory of cached detections, so unchanged images are not decoded again.
+        solution_cache (str): SolutionCache database, so repeated levels are not solved again.
+        with_stats (bool): Add the SolveStats counters of every solve to its record.
+        timeout (float): Seconds allowed per solve; slower puzzles are recorded with
+            status 'timeout' and their best partial grid. Defaults to None.
+        node_limit (int): Search nodes allowed per solve. Defaults to None.
+        render_dir (str): Directory to draw each solution onto its screenshot in. Defaults to None.
+
+    Returns:
+        dict: Counts of processed, solved, timed out and failed images.
+    """
+    solver_options = solver_options or {}
+    budget = {'timeout': timeout, 'node_limit': node_limit}
+    paths = enumerate(paths)
+    counts = {'images': 0, 'solved': 0, 'timeouts': 0, 'errors': 0}
+    started = {}
+    detecting = {}
+    solving = {}
+
+    def emit(record):
+        counts['images'] += 1
+        if record.get('solved'):
+            counts['solved'] += 1
+        if record.get('status') == 'timeout':
+            counts['timeouts'] += 1
+        if 'error' in record:
+            counts['errors'] += 1
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+
+    with ProcessPoolExecutor(max_workers=detect_workers) as detect_pool, \
+            ProcessPoolExecutor(max_workers=solve_workers) as solve_pool:
+        exhausted = False
+        while True:
+            # Backpressure: only pull new paths while the pipeline has room
+            while not exhausted and len(detecting) + len(solving) < max_in_flight:
+                item = next(paths, None)
+                if item is None:
+                    exhausted = True
+                    break
+                seq, path = item
+                started[seq] = time.perf_counter()
+                detecting[detect_pool.submit(_detect, path, grid_size, cache_dir)] = (seq, path)
+
+            if not detecting and not solving:
+                break
+
+            done, _ = wait(list(detecting) + list(solving), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in detecting:
+                    seq, path = detecting.pop(future)
+                    try:
+                        color_positions, geometry, detect_seconds = future.result()
+                    except Exception as e:
+                        emit({'image': path, 'error': f"detect: {e}"})
+                        del started[seq]
+                        continue
+                    solve_future = solve_pool.submit(_solve, color_positions, geometry, solver_options,
+                                                   solution_cache, with_stats, budget, path, render_dir)
+                    solving[solve_future] = (seq, path, geometry, color_positions, detect_seconds)
+                else:
+                    seq, path, geometry, color_positions, detect_seconds = solving.pop(future)
+                    record = {'image': path, 'grid_size': geometry[4], 'geometry': list(geometry),
+                              'color_positions': color_positions}
+                    try:
+                        status, grid, nodes, solve_seconds, stats = future.result()
+                        record.update(solved=status == 'solved', status=status, grid=grid, nodes=nodes)
+                        if stats is not None:
+                            record['stats'] = stats
+                    except Exception as e:
+                        solve_seconds = None
+                        record['error'] = f"solve: {e}"
+                    record['timings'] = {
+                        'detect_s': detect_seconds,
+                        'solve_s': solve_seconds,
+                        'total_s': time.perf_counter() - started.pop(seq),
+                    }
+                    emit(record)
+
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve every Flow Free screenshot in a directory or glob.")
+    parser.add_argument('inputs', nargs='+', help="Image files, directories or glob patterns")
+    parser.add_argument('-o', '--output', help="JSONL file to write (default: stdout)")
+    parser.add_argument('--grid-size', type=int, help="Board size (default: detect per image)")
+    parser.add_argument('--detect-workers', type=int, default=2)
+    parser.add_argument('--solve-workers', type=int, default=max(1, (os.cpu_count() or 2) - 2))
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--ordering', default='mrv', choices=('fixed', 'mrv'))
+    parser.add_argument('--cache-dir', help="Directory to cache detections in across runs")
+    parser.add_argument('--solution-cache', help="SQLite file to cache solutions in across runs")
+    parser.add_argument('--stats', action='store_true', help="Include search counters in every record")
+    parser.add_argument('--timeout', type=float, help="Seconds allowed per puzzle")
+    parser.add_argument('--node-limit', type=int, help="Search nodes allowed per puzzle")
+    parser.add_argument('--render', metavar='DIR', help="Write each solution drawn onto its screenshot to DIR")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        start = time.perf_counter()
+        counts = run_batch(iter_images(args.inputs), output, grid_size=args.grid_size,
+                           detect_workers=args.detect_workers, solve_workers=args.solve_workers,
+                           max_in_flight=args.max_in_flight, solver_options={'ordering': args.ordering},
+                           cache_dir=args.cache_dir, solution_cache=args.solution_cache,
+                           with_stats=args.stats, timeout=args.timeout, node_limit=args.node_limit,
+                           render_dir=args.render)
+    finally:
+        if args.output:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {counts['images']} images ({counts['solved']} solved, {counts['timeouts']} timed out, "
+          f"{counts['errors']} errors) "
+          f"in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
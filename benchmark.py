@@ -0,0 +1,386 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+# Fixed puzzle corpus: name -> (size, color_positions). The 5x5 boards are the
+# screenshots in examples/, the rest are generated solvable levels. Only the
+# screenshots have unique solutions (solutionCounter.uniqueness).
+CORPUS = {
+    '5x5-img5927': (5, {'red': [(4, 1), (0, 0)], 'green': [(3, 1), (0, 2)], 'blue': [(4, 2), (1, 2)],
+        'yellow': [(3, 3), (0, 4)], 'orange': [(4, 3), (1, 4)]}),
+    '5x5-img5929': (5, {'red': [(4, 0), (3, 2)], 'green': [(3, 1), (2, 2)], 'blue': [(4, 4), (3, 0)],
+        'yellow': [(3, 4), (0, 0)]}),
+    '5x5-img5931': (5, {'red': [(2, 2), (1, 3)], 'green': [(4, 3), (0, 3)], 'blue': [(4, 0), (0, 2)],
+        'yellow': [(3, 0), (0, 1)], 'orange': [(4, 2), (3, 3)]}),
+    '6x6-0': (6, {'c0': [(5, 1), (4, 0)], 'c1': [(3, 0), (4, 2)], 'c2': [(5, 2), (5, 4)],
+        'c3': [(5, 5), (1, 3)], 'c4': [(1, 4), (3, 4)], 'c5': [(3, 5), (0, 3)], 'c6': [(0, 2), (0, 1)]}),
+    '6x6-1': (6, {'c0': [(0, 0), (0, 2)], 'c1': [(0, 3), (1, 3)], 'c2': [(2, 3), (2, 5)],
+        'c3': [(3, 5), (5, 5)], 'c4': [(5, 4), (3, 4)], 'c5': [(3, 3), (4, 0)], 'c6': [(4, 1), (3, 0)]}),
+    '6x6-2': (6, {'c0': [(4, 4), (2, 4)], 'c1': [(1, 4), (5, 4)], 'c2': [(5, 3), (3, 2)],
+        'c3': [(2, 2), (1, 3)], 'c4': [(0, 3), (3, 0)], 'c5': [(4, 0), (5, 1)], 'c6': [(4, 1), (2, 1)]}),
+    '7x7-0': (7, {'c0': [(0, 0), (2, 0)], 'c1': [(3, 0), (6, 0)], 'c2': [(6, 1), (4, 2)],
+        'c3': [(3, 2), (2, 1)], 'c4': [(1, 1), (0, 4)], 'c5': [(1, 4), (2, 6)], 'c6': [(3, 6), (3, 3)],
+        'c7': [(4, 3), (4, 5)], 'c8': [(4, 6), (5, 5)]}),
+    '7x7-1': (7, {'c0': [(6, 4), (6, 6)], 'c1': [(5, 6), (5, 4)], 'c2': [(4, 4), (6, 1)],
+        'c3': [(6, 0), (4, 1)], 'c4': [(4, 0), (3, 1)], 'c5': [(3, 2), (2, 5)], 'c6': [(1, 5), (0, 6)],
+        'c7': [(0, 5), (2, 1)], 'c8': [(2, 0), (0, 0)]}),
+    '7x7-2': (7, {'c0': [(0, 0), (1, 5)], 'c1': [(1, 4), (2, 0)], 'c2': [(2, 1), (3, 0)],
+        'c3': [(4, 0), (5, 1)], 'c4': [(5, 0), (6, 1)], 'c5': [(6, 2), (4, 5)], 'c6': [(5, 5), (6, 6)],
+        'c7': [(5, 6), (2, 3)], 'c8': [(2, 2), (4, 2)]}),
+    '8x8-0': (8, {'c0': [(7, 5), (5, 1)], 'c1': [(5, 2), (3, 3)], 'c2': [(3, 2), (3, 0)],
+        'c3': [(2, 0), (0, 0)], 'c4': [(0, 1), (2, 1)], 'c5': [(2, 2), (2, 5)], 'c6': [(2, 6), (3, 7)],
+        'c7': [(4, 7), (5, 6)], 'c8': [(4, 6), (3, 5)], 'c9': [(4, 5), (6, 7)]}),
+    '8x8-1': (8, {'c0': [(0, 5), (0, 3)], 'c1': [(1, 3), (3, 3)], 'c2': [(3, 4), (4, 5)],
+        'c3': [(4, 6), (0, 7)], 'c4': [(1, 7), (6, 6)], 'c5': [(6, 7), (4, 3)], 'c6': [(5, 3), (2, 1)],
+        'c7': [(1, 1), (1, 0)], 'c8': [(2, 0), (6, 1)], 'c9': [(6, 0), (7, 3)]}),
+    '8x8-2': (8, {'c0': [(7, 4), (6, 3)], 'c1': [(7, 3), (7, 1)], 'c2': [(7, 0), (0, 0)],
+        'c3': [(0, 1), (0, 4)], 'c4': [(0, 5), (0, 7)], 'c5': [(1, 7), (2, 7)], 'c6': [(3, 7), (6, 7)],
+        'c7': [(7, 7), (7, 5)], 'c8': [(6, 5), (3, 3)], 'c9': [(2, 3), (2, 4)]}),
+    '9x9-0': (9, {'c0': [(8, 0), (6, 0)], 'c1': [(5, 0), (7, 3)], 'c2': [(7, 2), (8, 4)],
+        'c3': [(8, 5), (5, 5)], 'c4': [(6, 5), (5, 7)], 'c5': [(5, 6), (0, 7)], 'c6': [(0, 6), (1, 5)],
+        'c7': [(2, 5), (2, 4)], 'c8': [(2, 3), (4, 2)], 'c9': [(3, 2), (1, 1)], 'c10': [(1, 2), (0, 4)]}),
+    '9x9-1': (9, {'c0': [(2, 4), (4, 6)], 'c1': [(4, 5), (6, 5)], 'c2': [(7, 5), (7, 8)],
+        'c3': [(7, 7), (6, 6)], 'c4': [(5, 6), (3, 8)], 'c5': [(2, 8), (0, 6)], 'c6': [(0, 5), (0, 3)],
+        'c7': [(0, 2), (1, 2)], 'c8': [(2, 2), (3, 4)], 'c9': [(4, 4), (7, 4)], 'c10': [(8, 4), (7, 1)]}),
+    '9x9-2': (9, {'c0': [(1, 5), (1, 8)], 'c1': [(2, 8), (5, 8)], 'c2': [(6, 8), (7, 7)],
+        'c3': [(7, 8), (6, 1)], 'c4': [(7, 1), (7, 3)], 'c5': [(7, 4), (6, 5)], 'c6': [(6, 6), (5, 7)],
+        'c7': [(4, 7), (3, 0)], 'c8': [(2, 0), (0, 0)], 'c9': [(0, 1), (1, 3)], 'c10': [(0, 3), (0, 8)]}),
+    '10x10-0': (10, {'c0': [(7, 6), (8, 7)], 'c1': [(8, 8), (7, 7)], 'c2': [(6, 7), (7, 5)],
+        'c3': [(8, 5), (8, 1)], 'c4': [(7, 1), (4, 1)], 'c5': [(4, 2), (5, 3)], 'c6': [(5, 4), (2, 7)],
+        'c7': [(2, 8), (1, 7)], 'c8': [(0, 7), (0, 9)], 'c9': [(1, 9), (9, 8)], 'c10': [(9, 7), (9, 5)],
+        'c11': [(9, 4), (0, 4)], 'c12': [(0, 5), (3, 1)]}),
+    '10x10-1': (10, {'c0': [(8, 1), (8, 4)], 'c1': [(8, 5), (6, 5)], 'c2': [(5, 5), (2, 3)],
+        'c3': [(1, 3), (0, 4)], 'c4': [(1, 4), (2, 4)], 'c5': [(3, 4), (3, 7)], 'c6': [(2, 7), (1, 8)],
+        'c7': [(0, 8), (1, 9)], 'c8': [(2, 9), (9, 8)], 'c9': [(9, 7), (9, 5)], 'c10': [(9, 4), (8, 0)],
+        'c11': [(7, 0), (5, 2)], 'c12': [(4, 2), (1, 1)]}),
+    '10x10-2': (10, {'c0': [(1, 1), (3, 1)], 'c1': [(3, 2), (2, 3)], 'c2': [(2, 2), (5, 5)],
+        'c3': [(5, 4), (6, 5)], 'c4': [(6, 6), (3, 4)], 'c5': [(2, 4), (3, 8)], 'c6': [(2, 8), (9, 8)],
+        'c7': [(9, 7), (9, 5)], 'c8': [(8, 5), (8, 7)], 'c9': [(8, 8), (8, 4)], 'c10': [(9, 4), (8, 0)],
+        'c11': [(7, 0), (6, 1)], 'c12': [(6, 0), (8, 1)]}),
+    '11x11-0': (11, {'c0': [(0, 8), (0, 6)], 'c1': [(1, 6), (1, 9)], 'c2': [(0, 9), (6, 9)],
+        'c3': [(7, 9), (8, 10)], 'c4': [(8, 9), (10, 6)], 'c5': [(9, 6), (8, 5)], 'c6': [(9, 5), (9, 4)],
+        'c7': [(8, 4), (7, 3)], 'c8': [(7, 4), (3, 1)], 'c9': [(2, 1), (3, 3)], 'c10': [(3, 4), (5, 5)],
+        'c11': [(6, 5), (7, 7)], 'c12': [(7, 8), (4, 8)], 'c13': [(3, 8), (2, 8)]}),
+    '11x11-1': (11, {'c0': [(5, 5), (7, 5)], 'c1': [(7, 6), (8, 4)], 'c2': [(9, 4), (8, 3)],
+        'c3': [(8, 2), (2, 1)], 'c4': [(1, 1), (4, 1)], 'c5': [(4, 0), (6, 0)], 'c6': [(7, 0), (10, 0)],
+        'c7': [(10, 1), (9, 2)], 'c8': [(10, 2), (10, 7)], 'c9': [(9, 7), (9, 5)], 'c10': [(8, 5), (8, 7)],
+        'c11': [(8, 8), (7, 8)], 'c12': [(6, 8), (0, 10)], 'c13': [(1, 10), (2, 8)]}),
+    '11x11-2': (11, {'c0': [(1, 3), (0, 0)], 'c1': [(1, 0), (3, 2)], 'c2': [(4, 2), (6, 1)],
+        'c3': [(5, 1), (6, 2)], 'c4': [(6, 3), (5, 5)], 'c5': [(5, 4), (6, 7)], 'c6': [(6, 8), (4, 9)],
+        'c7': [(3, 9), (2, 6)], 'c8': [(2, 7), (0, 9)], 'c9': [(0, 10), (7, 10)], 'c10': [(7, 9), (10, 9)],
+        'c11': [(9, 9), (10, 5)], 'c12': [(9, 5), (8, 7)], 'c13': [(8, 8), (10, 4)]}),
+    '12x12-0': (12, {'c0': [(0, 6), (2, 1)], 'c1': [(2, 2), (4, 3)], 'c2': [(3, 3), (7, 6)],
+        'c3': [(6, 6), (8, 2)], 'c4': [(9, 2), (9, 4)], 'c5': [(9, 5), (10, 3)], 'c6': [(10, 2), (9, 1)],
+        'c7': [(9, 0), (11, 3)], 'c8': [(11, 4), (8, 10)], 'c9': [(9, 10), (11, 10)],
+        'c10': [(11, 11), (3, 10)], 'c11': [(4, 10), (5, 8)], 'c12': [(4, 8), (2, 5)],
+        'c13': [(1, 5), (1, 11)], 'c14': [(2, 11), (1, 8)]}),
+    '12x12-1': (12, {'c0': [(11, 2), (9, 0)], 'c1': [(8, 0), (8, 2)], 'c2': [(7, 2), (0, 2)],
+        'c3': [(0, 3), (6, 3)], 'c4': [(6, 4), (8, 5)], 'c5': [(8, 6), (7, 8)], 'c6': [(6, 8), (4, 5)],
+        'c7': [(3, 5), (0, 10)], 'c8': [(0, 11), (1, 10)], 'c9': [(1, 9), (4, 10)], 'c10': [(4, 11), (7, 11)],
+        'c11': [(7, 10), (11, 10)], 'c12': [(11, 9), (11, 3)], 'c13': [(11, 4), (10, 5)],
+        'c14': [(11, 5), (10, 6)]}),
+    '12x12-2': (12, {'c0': [(11, 11), (10, 4)], 'c1': [(10, 3), (11, 2)], 'c2': [(11, 1), (8, 0)],
+        'c3': [(8, 1), (7, 6)], 'c4': [(7, 5), (8, 4)], 'c5': [(8, 3), (9, 4)], 'c6': [(9, 5), (7, 10)],
+        'c7': [(7, 9), (5, 6)], 'c8': [(5, 5), (4, 4)], 'c9': [(4, 5), (3, 4)], 'c10': [(3, 3), (3, 1)],
+        'c11': [(4, 1), (0, 4)], 'c12': [(0, 5), (0, 6)], 'c13': [(0, 7), (1, 11)],
+        'c14': [(1, 10), (2, 11)]}),
+    '13x13-0': (13, {'c0': [(10, 2), (10, 0)], 'c1': [(9, 0), (7, 2)], 'c2': [(6, 2), (11, 9)],
+        'c3': [(10, 9), (10, 11)], 'c4': [(10, 12), (9, 11)], 'c5': [(9, 10), (7, 10)],
+        'c6': [(6, 10), (4, 11)], 'c7': [(3, 11), (2, 12)], 'c8': [(2, 11), (1, 12)], 'c9': [(0, 12), (7, 9)],
+        'c10': [(8, 9), (8, 8)], 'c11': [(7, 8), (7, 6)], 'c12': [(6, 6), (5, 1)], 'c13': [(6, 1), (3, 5)],
+        'c14': [(2, 5), (1, 5)], 'c15': [(1, 6), (0, 6)]}),
+    '13x13-1': (13, {'c0': [(6, 12), (8, 10)], 'c1': [(9, 10), (11, 10)], 'c2': [(11, 11), (9, 9)],
+        'c3': [(8, 9), (5, 11)], 'c4': [(5, 12), (3, 12)], 'c5': [(2, 12), (5, 8)], 'c6': [(4, 8), (0, 7)],
+        'c7': [(0, 6), (3, 4)], 'c8': [(3, 5), (7, 5)], 'c9': [(6, 5), (8, 4)], 'c10': [(8, 3), (9, 4)],
+        'c11': [(10, 4), (8, 7)], 'c12': [(7, 7), (10, 7)], 'c13': [(10, 6), (12, 3)],
+        'c14': [(12, 2), (7, 0)], 'c15': [(6, 0), (11, 3)]}),
+    '13x13-2': (13, {'c0': [(0, 0), (5, 0)], 'c1': [(6, 0), (12, 9)], 'c2': [(11, 9), (11, 12)],
+        'c3': [(11, 11), (8, 8)], 'c4': [(7, 8), (7, 11)], 'c5': [(6, 11), (5, 12)], 'c6': [(5, 11), (4, 10)],
+        'c7': [(3, 10), (9, 6)], 'c8': [(8, 6), (1, 6)], 'c9': [(1, 5), (4, 4)], 'c10': [(4, 5), (6, 5)],
+        'c11': [(6, 4), (6, 3)], 'c12': [(7, 3), (0, 1)], 'c13': [(0, 2), (0, 4)], 'c14': [(0, 5), (2, 12)],
+        'c15': [(3, 12), (4, 12)]}),
+    '14x14-0': (14, {'c0': [(1, 10), (0, 8)], 'c1': [(0, 9), (0, 11)], 'c2': [(1, 11), (0, 13)],
+        'c3': [(1, 13), (3, 13)], 'c4': [(4, 13), (8, 13)], 'c5': [(9, 13), (10, 11)],
+        'c6': [(11, 11), (12, 8)], 'c7': [(12, 9), (8, 7)], 'c8': [(9, 7), (4, 5)], 'c9': [(3, 5), (13, 2)],
+        'c10': [(13, 1), (5, 0)], 'c11': [(4, 0), (2, 2)], 'c12': [(2, 3), (4, 12)],
+        'c13': [(4, 11), (5, 10)], 'c14': [(6, 10), (7, 11)], 'c15': [(7, 12), (7, 9)],
+        'c16': [(6, 9), (3, 6)], 'c17': [(3, 7), (4, 8)]}),
+    '14x14-1': (14, {'c0': [(2, 2), (7, 7)], 'c1': [(6, 7), (5, 8)], 'c2': [(5, 9), (7, 10)],
+        'c3': [(7, 11), (9, 8)], 'c4': [(8, 8), (8, 6)], 'c5': [(8, 5), (8, 3)], 'c6': [(8, 2), (10, 6)],
+        'c7': [(10, 5), (12, 4)], 'c8': [(12, 5), (13, 6)], 'c9': [(12, 6), (12, 8)],
+        'c10': [(11, 8), (5, 13)], 'c11': [(4, 13), (1, 12)], 'c12': [(1, 13), (1, 8)],
+        'c13': [(1, 7), (0, 6)], 'c14': [(0, 5), (0, 0)], 'c15': [(1, 0), (3, 0)], 'c16': [(4, 0), (7, 2)],
+        'c17': [(7, 1), (7, 0)]}),
+    '14x14-2': (14, {'c0': [(13, 6), (12, 7)], 'c1': [(12, 6), (12, 1)], 'c2': [(12, 2), (11, 1)],
+        'c3': [(11, 0), (7, 1)], 'c4': [(8, 1), (3, 0)], 'c5': [(2, 0), (0, 7)], 'c6': [(1, 7), (5, 4)],
+        'c7': [(4, 4), (2, 1)], 'c8': [(3, 1), (10, 4)], 'c9': [(9, 4), (11, 4)], 'c10': [(11, 5), (9, 10)],
+        'c11': [(9, 11), (6, 11)], 'c12': [(6, 10), (4, 12)], 'c13': [(4, 13), (0, 12)],
+        'c14': [(1, 12), (3, 10)], 'c15': [(4, 10), (5, 6)], 'c16': [(5, 7), (7, 6)],
+        'c17': [(7, 5), (6, 8)]}),
+}
+
+# Levels the plain depth-first search needs seconds or more for
+HARD_CASES = {
+    '10x10-1', '11x11-0', '11x11-1', '11x11-2', '12x12-1', '12x12-2',
+    '13x13-0', '13x13-1', '13x13-2', '14x14-0', '14x14-1', '14x14-2',
+}
+
+# Solver configurations: name -> FlowFreeSolver keyword arguments
+CONFIGS = {
+    'dfs-fixed': {'backend': 'dfs', 'ordering': 'fixed'},
+    'dfs-mrv': {'backend': 'dfs', 'ordering': 'mrv'},
+    'sat': {'backend': 'sat'},
+}
+
+# Resolved against this file, so the benchmark runs from any working directory
+EXAMPLE_IMAGES = tuple(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', name)
+                       for name in ('IMG_5927.PNG', 'IMG_5929.PNG', 'IMG_5931.PNG'))
+
+# Modules whose cold import time is tracked
+IMPORT_MODULES = ('FlowFreePuzzleSolver', 'test', 'createImage', 'batchSolve', 'warmWorker', 'Execution')
+
+
+def _solve_case(conn, size, color_positions, options):
+    from FlowFreePuzzleSolver import FlowFreeSolver, is_solution
+
+    solver = FlowFreeSolver(size, color_positions, **options)
+    start = time.perf_counter()
+    solved = solver.solve()
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+    conn.send({
+        'solved': solved,
+        'valid': is_solution(size, color_positions, solver.grid) if solved else None,
+        'seconds': seconds,
+        'nodes': solver.nodes,
+        'peak_rss_mb': round(peak_mb, 1),
+    })
+
+
+def run_case(size, color_positions, options, timeout):
+    """
+    Solves one puzzle in a fresh process so timeouts and peak memory are isolated.
+
+    Returns:
+        dict: solved, valid, seconds, nodes and peak_rss_mb, with status 'ok', 'timeout' or 'error'.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_solve_case, args=(sender, size, color_positions, options))
+    process.start()
+    sender.close()
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+            result['status'] = 'ok'
+        except EOFError:
+            result = {'status': 'error'}
+    else:
+        process.terminate()
+        result = {'status': 'timeout', 'seconds': timeout}
+    process.join()
+    return result
+
+
+def benchmark_solvers(configs=None, sizes=None, timeout=10.0, repeat=1):
+    """
+    Runs every configuration on the corpus.
+
+    Args:
+        configs (list): Names from CONFIGS. Defaults to all of them.
+        sizes (list): Board sizes to include. Defaults to all.
+        timeout (float): Seconds allowed per solve.
+        repeat (int): Runs per case; the fastest is kept.
+
+    Returns:
+        list: One record per (config, case).
+    """
+    records = []
+    for config in configs or list(CONFIGS):
+        for name, (size, color_positions) in CORPUS.items():
+            if sizes and size not in sizes:
+                continue
+            runs = [run_case(size, color_positions, CONFIGS[config], timeout) for _ in range(repeat)]
+            best = min(runs, key=lambda run: (run['status'] != 'ok', run.get('seconds', timeout)))
+            record = {'config': config, 'case': name, 'size': size, 'hard': name in HARD_CASES}
+            record.update(best)
+            records.append(record)
+            print(f"{config:>10} {name:>12} {best['status']:>8} {best.get('seconds', 0):8.3f}s "
+                  f"{best.get('nodes', '')!s:>9}", file=sys.stderr)
+    return records
+
+
+def benchmark_detector(images=EXAMPLE_IMAGES, repeat=5):
+    """
+    Times ColorGridDetector.detect_colors per image with caching disabled.
+
+    The first call per image is reported on its own; for the first image it
+    also includes building the HSV lookup table.
+
+    Returns:
+        list: {'image', 'first_s', 'median_s', 'min_s'} per image.
+    """
+    from test import ColorGridDetector, DetectionCache
+
+    records = []
+    for path in images:
+        times = []
+        for _ in range(repeat + 1):
+            detector = ColorGridDetector(cache=DetectionCache(max_entries=0))
+            start = time.perf_counter()
+            detector.detect_colors(path)
+            times.append(time.perf_counter() - start)
+        records.append({
+            'image': path,
+            'first_s': times[0],
+            'median_s': statistics.median(times[1:]),
+            'min_s': min(times[1:]),
+        })
+    return records
+
+
+def benchmark_imports(modules=IMPORT_MODULES, repeat=5):
+    """
+    Measures how long a fresh interpreter takes to import each module.
+
+    Uses python -X importtime, which reports the cumulative import time of
+    every module; the best of repeat runs is kept.
+
+    Returns:
+        list: {'module', 'import_ms', 'heavy'} per module, heavy listing the
+            slow third-party libraries (cv2, numpy, matplotlib) it pulled in.
+    """
+    heavy_modules = ('cv2', 'numpy', 'matplotlib')
+    records = []
+    for module in modules:
+        best = None
+        heavy = []
+        for _ in range(repeat):
+            process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                     capture_output=True, text=True,
+                                     cwd=os.path.dirname(os.path.abspath(__file__)))
+            times = {}
+            for line in process.stderr.splitlines():
+                if not line.startswith('import time:') or '|' not in line:
+                    continue
+                _, cumulative, name = line[len('import time:'):].split('|')
+                if cumulative.strip().isdigit():
+                    times[name.strip()] = int(cumulative)
+            if module not in times:
+                continue
+            if best is None or times[module] < best:
+                best = times[module]
+                heavy = [name for name in heavy_modules if name in times]
+        records.append({'module': module, 'import_ms': best / 1000 if best is not None else None, 'heavy': heavy})
+    return records
+
+
+def summarize(records):
+    """Returns solve rate, total time and total nodes per config."""
+    summary = {}
+    for config in dict.fromkeys(record['config'] for record in records):
+        runs = [record for record in records if record['config'] == config]
+        solved = [record for record in runs if record.get('solved')]
+        summary[config] = {
+            'cases': len(runs),
+            'solve_rate': len(solved) / len(runs),
+            'hard_solve_rate': (sum(1 for record in solved if record['hard'])
+                                / max(1, sum(1 for record in runs if record['hard']))),
+            'timeouts': sum(1 for record in runs if record['status'] == 'timeout'),
+            'invalid': sum(1 for record in solved if not record['valid']),
+            'seconds': sum(record.get('seconds', 0) for record in runs),
+            'nodes': sum(record.get('nodes', 0) for record in solved),
+        }
+    return summary
+
+
+def compare(baseline, current, threshold=1.25):
+    """
+    Prints cases that got slower than threshold times the baseline or stopped solving.
+
+    Returns:
+        list: (config, case, baseline seconds, current seconds) for every regression.
+    """
+    before = {(record['config'], record['case']): record for record in baseline['solver']}
+    regressions = []
+    for record in current['solver']:
+        old = before.get((record['config'], record['case']))
+        if old is None:
+            continue
+        lost = old.get('solved') and not record.get('solved')
+        # A case that errored has no time to compare
+        slower = ('seconds' in old and 'seconds' in record
+                  and record['seconds'] > threshold * old['seconds'] + 0.005)
+        if lost or slower:
+            regressions.append((record['config'], record['case'], old.get('seconds'), record.get('seconds')))
+            print(f"REGRESSION {record['config']} {record['case']}: "
+                  f"{_format_seconds(old)} -> {_format_seconds(record)}")
+    return regressions
+
+
+def _format_seconds(record):
+    if record.get('seconds') is None:
+        return record.get('status', 'error')
+    return f"{record['seconds']:.3f}s"
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solvers and the detector on a fixed corpus.")
+    parser.add_argument('-o', '--output', help="JSON file to write (default: stdout)")
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), help="Solver configurations to run")
+    parser.add_argument('--sizes', nargs='+', type=int, help="Only run boards of these sizes")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds allowed per solve")
+    parser.add_argument('--repeat', type=int, default=1, help="Runs per case, keeping the fastest")
+    parser.add_argument('--skip-detector', action='store_true', help="Don't benchmark the detector")
+    parser.add_argument('--skip-imports', action='store_true', help="Don't benchmark module import times")
+    parser.add_argument('--compare', help="Earlier JSON results to check for regressions")
+    args = parser.parse_args(argv)
+
+    records = benchmark_solvers(args.configs, args.sizes, args.timeout, args.repeat)
+    results = {
+        'meta': {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'cpus': os.cpu_count(),
+            'timeout': args.timeout,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'summary': summarize(records),
+        'solver': records,
+        'detector': [] if args.skip_detector else benchmark_detector(),
+        'imports': [] if args.skip_imports else benchmark_imports(),
+    }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
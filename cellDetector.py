@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Samples are taken at each cell's centre and at offset cell sizes above, below,
+# left and right of it. A dot covers all five; a straight path or a turn covers
+# the centre and two of the others, as long as offset is more than half its width.
+SAMPLES = 5
+
+# Offset, in cell sizes, for profiles calibrated before the dot radius was measured
+DEFAULT_OFFSET = 0.25
+
+# Offset as a fraction of the measured dot radius, keeping the outer samples inside the dot
+DOT_FRACTION = 0.8
+
+# Side of the square of pixels averaged at each sample point
+PATCH = 3
+
+# Farthest a sample may be from every palette entry, in CIE Lab units, before it is left unclassified
+MAX_DISTANCE = 30.0
+
+# Cell states reported in CellSampleDetector.states
+EMPTY, DOT, PATH = 'empty', 'dot', 'path'
+
+
+def _lab(bgr):
+    """Converts an (..., 3) array of BGR values in 0-255 to CIE Lab."""
+    import cv2
+    import numpy as np
+
+    pixels = np.asarray(bgr, dtype=np.float32).reshape(-1, 1, 3) / 255
+    return cv2.cvtColor(pixels, cv2.COLOR_BGR2Lab).reshape(np.shape(bgr))
+
+
+def calibrate(name, image_paths, detector=None):
+    """
+    Builds a device profile from one or more screenshots of unplayed levels.
+
+    The contour-based ColorGridDetector finds the board and its dots on each
+    screenshot. The geometry of the first one is recorded, the Lab colour
+    at the dots and at the empty cells becomes the palette and the dot
+    radius sets how far from the centre the outer samples go. Screenshots
+    must come from the same device; use several to cover more colours.
+
+    Args:
+        name (str): Profile name, e.g. the device model.
+        image_paths (list): Screenshots taken on that device.
+        detector (ColorGridDetector): Detector to calibrate with. Defaults to a new one.
+
+    Returns:
+        dict: The profile, ready for save_profile or CellSampleDetector.
+    """
+    import cv2
+    import numpy as np
+    from test import ColorGridDetector
+
+    detector = detector or ColorGridDetector()
+    profile = None
+    samples = {}
+    background = []
+    radii = []
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            raise ValueError(f"Could not read {path}")
+        positions = detector.detect_frame(image)[0]
+        geometry = detector.geometry
+        if profile is None:
+            profile = {'name': name, 'image_size': [image.shape[1], image.shape[0]], 'geometry': list(geometry)}
+        elif [image.shape[1], image.shape[0]] != profile['image_size'] or list(geometry) != profile['geometry']:
+            raise ValueError(f"{path} doesn't match the size or board of {image_paths[0]}")
+
+        radii.extend(_dot_radii(image, positions, geometry))
+        points = _sample_points(profile['image_size'], profile['geometry'], DEFAULT_OFFSET)
+        patches = image[points].reshape(geometry.rows, geometry.cols, SAMPLES, -1, 3).mean(axis=3)
+        dots = set()
+        for color, cells in positions.items():
+            for row, col in cells:
+                samples.setdefault(color, []).append(patches[row, col, 0])
+                dots.add((row, col))
+        background.extend(patches[row, col, 0] for row in range(geometry.rows) for col in range(geometry.cols)
+                           if (row, col) not in dots)
+
+    profile['palette'] = {color: _lab(np.mean(values, axis=0)).tolist() for color, values in samples.items()}
+    profile['background'] = _lab(np.median(background, axis=0)).tolist()
+    if radii:
+        profile['dot_radius'] = round(float(np.median(radii)), 4)
+        profile['sample_offset'] = round(DOT_FRACTION * profile['dot_radius'], 4)
+    return profile
+
+
+def _dot_radii(image, positions, geometry):
+    """
+    Measures every dot's radius, in cell sizes, along the directions the outer samples lie in.
+
+    Each ray runs from the dot's centre until the colour moves more than
+    MAX_DISTANCE away from the centre's.
+    """
+    import numpy as np
+
+    x, y, board_width, board_height, rows, cols = geometry
+    cell = min(board_width / cols, board_height / rows)
+    steps = np.arange(int(cell / 2))
+    radii = []
+    for cells in positions.values():
+        for row, col in cells:
+            centre_y = y + (row + 0.5) * board_height / rows
+            centre_x = x + (col + 0.5) * board_width / cols
+            for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                ys = np.clip(np.rint(centre_y + dy * steps).astype(np.intp), 0, image.shape[0] - 1)
+                xs = np.clip(np.rint(centre_x + dx * steps).astype(np.intp), 0, image.shape[1] - 1)
+                lab = _lab(image[ys, xs])
+                outside = np.flatnonzero(np.linalg.norm(lab - lab[0], axis=1) > MAX_DISTANCE)
+                radii.append((outside[0] if len(outside) else len(steps)) / cell)
+    return radii
+
+
+def _sample_points(image_size, geometry, offset):
+    """
+    Returns (ys, xs) index arrays picking every sample patch of every cell.
+
+    Shaped (rows * cols * samples * PATCH * PATCH), in row-major cell order,
+    so one fancy-indexing read fetches them all.
+    """
+    import numpy as np
+
+    width, height = image_size
+    x, y, board_width, board_height, rows, cols = geometry
+    cell_width, cell_height = board_width / cols, board_height / rows
+    # Centre, above, below, left, right
+    offset_y = np.array([0, -offset, offset, 0, 0])
+    offset_x = np.array([0, 0, 0, -offset, offset])
+    centre_y = y + (np.arange(rows)[:, None, None] + 0.5 + offset_y) * cell_height
+    centre_x = x + (np.arange(cols)[None, :, None] + 0.5 + offset_x) * cell_width
+    centre_y, centre_x = np.broadcast_arrays(centre_y, centre_x)
+    patch = np.arange(PATCH) - PATCH // 2
+    ys = np.rint(centre_y)[..., None, None].astype(np.intp) + patch[:, None]
+    xs = np.rint(centre_x)[..., None, None].astype(np.intp) + patch[None, :]
+    ys, xs = np.broadcast_arrays(ys, xs)
+    return np.clip(ys, 0, height - 1).ravel(), np.clip(xs, 0, width - 1).ravel()
+
+
+def save_profile(profile, directory):
+    """Writes a profile to directory/<name>.json and returns the path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, profile['name'] + '.json')
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    return path
+
+
+def load_profile(directory, name):
+    """Reads the profile saved as directory/<name>.json."""
+    with open(os.path.join(directory, name + '.json')) as f:
+        return json.load(f)
+
+
+class CellSampleDetector:
+    """
+    Fast detector for screenshots whose board position is known in advance.
+
+    Instead of scanning every pixel for every colour, it reads a few small
+    patches around each cell centre with one NumPy indexing operation and
+    classifies them by nearest palette colour in Lab space, so the work is
+    proportional to the number of cells. A cell whose centre and at least
+    three of the samples around it match one colour holds a dot; one whose
+    centre matches with fewer is crossed by a path.
+    """
+
+    def __init__(self, profile, cross_check=False, max_distance=MAX_DISTANCE):
+        """
+        Args:
+            profile (dict): Device profile from calibrate or load_profile.
+            cross_check (bool): Also run the contour-based ColorGridDetector on every image
+                and use its answer when the two disagree. Defaults to False.
+            max_distance (float): Lab distance beyond which a sample matches no palette colour.
+        """
+        import numpy as np
+
+        self.profile = profile
+        self.cross_check = cross_check
+        self.max_distance = max_distance
+        self.geometry = None
+        # Per-cell states of the last image, states[row][col] is EMPTY, DOT, PATH or None
+        self.states = None
+        self.mismatches = 0
+        self.fallbacks = 0
+        self._fallback = None
+
+        from test import GridGeometry
+
+        self._geometry = GridGeometry(*profile['geometry'])
+        self._size = tuple(profile['image_size'])
+        self._points = _sample_points(self._size, self._geometry, profile.get('sample_offset', DEFAULT_OFFSET))
+        self._colors = list(profile['palette'])
+        # Row 0 is the background, row i the i-th colour
+        self._palette = np.array([profile['background']] + [profile['palette'][c] for c in self._colors],
+                                 dtype=np.float32)
+
+    def _contour_detector(self):
+        if self._fallback is None:
+            from test import ColorGridDetector
+
+            self._fallback = ColorGridDetector()
+        return self._fallback
+
+    def classify(self, img):
+        """
+        Classifies every cell of a BGR image taken at the profile's resolution.
+
+        Returns:
+            tuple: (labels, states) where labels[row][col] is the colour name or None.
+        """
+        import numpy as np
+
+        rows, cols = self._geometry.rows, self._geometry.cols
+        patches = img[self._points].reshape(rows * cols * SAMPLES, PATCH * PATCH, 3).mean(axis=1)
+        lab = _lab(patches)
+        distance = np.linalg.norm(lab[:, None, :] - self._palette[None, :, :], axis=2)
+        nearest = distance.argmin(axis=1)
+        nearest[distance.min(axis=1) > self.max_distance] = -1
+        nearest = nearest.reshape(rows, cols, SAMPLES)
+
+        labels = [[None] * cols for _ in range(rows)]
+        states = [[None] * cols for _ in range(rows)]
+        for row in range(rows):
+            for col in range(cols):
+                centre = nearest[row, col, 0]
+                if centre == 0:
+                    states[row][col] = EMPTY
+                elif centre > 0:
+                    labels[row][col] = self._colors[centre - 1]
+                    around = (nearest[row, col, 1:] == centre).sum()
+                    states[row][col] = DOT if around >= 3 else PATH
+        return labels, states
+
+    def detect_frame(self, frame):
+        """
+        Detects the dots in a decoded BGR frame.
+
+        Frames at another resolution than the profile's go to the contour-based
+        detector instead.
+
+        Returns:
+            tuple: ({'color': [(row, col), ...]}, {'color': [(x, y), ...]}) like ColorGridDetector.detect.
+        """
+        if (frame.shape[1], frame.shape[0]) != self._size:
+            self.fallbacks += 1
+            detector = self._contour_detector()
+            result = detector.detect_frame(frame)
+            self.geometry, self.states = detector.geometry, None
+            return result
+
+        labels, self.states = self.classify(frame)
+        self.geometry = self._geometry
+        positions = {color: [] for color in self._colors}
+        coords = {color: [] for color in self._colors}
+        cell_width = self._geometry.width / self._geometry.cols
+        cell_height = self._geometry.height / self._geometry.rows
+        for row, line in enumerate(self.states):
+            for col, state in enumerate(line):
+                if state == DOT:
+                    color = labels[row][col]
+                    positions[color].append((row, col))
+                    coords[color].append((int(self._geometry.x + (col + 0.5) * cell_width),
+                                          int(self._geometry.y + (row + 0.5) * cell_height)))
+
+        if self.cross_check:
+            detector = self._contour_detector()
+            checked, checked_coords = detector.detect_frame(frame)
+            found = {color: sorted(cells) for color, cells in positions.items() if cells}
+            expected = {color: sorted(cells) for color, cells in checked.items() if cells}
+            if found != expected:
+                self.mismatches += 1
+                print(f"Warning: Cell sampling found {found}, the contour detector {expected}; using the latter")
+                self.geometry = detector.geometry
+                return checked, checked_coords
+        return positions, coords
+
+    def detect(self, image_path):
+        """Reads an image and returns detect_frame's result, or ({}, {}) if it can't be read."""
+        import cv2
+
+        self.geometry = None
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Error: Could not open or find the image at {image_path}")
+            return {}, {}
+        return self.detect_frame(image)
+
+    def detect_colors(self, image_path):
+        """
+        Detects colored circles in a grid image.
+
+        Args:
+            image_path (str): Path to the image.
+
+        Returns:
+            dict: {'color': [(row, col), ...]}
+        """
+        return self.detect(image_path)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate device profiles and detect boards by cell sampling.")
+    parser.add_argument('--profiles', default='profiles', help="Directory of device profiles")
+    commands = parser.add_subparsers(dest='command', required=True)
+    calibrate_command = commands.add_parser('calibrate', help="Record a device's board geometry and palette")
+    calibrate_command.add_argument('name')
+    calibrate_command.add_argument('images', nargs='+', help="Screenshots of unplayed levels from the device")
+    detect = commands.add_parser('detect', help="Detect the dots in screenshots")
+    detect.add_argument('name')
+    detect.add_argument('images', nargs='+')
+    detect.add_argument('--cross-check', action='store_true', help="Compare with the contour-based detector")
+    args = parser.parse_args(argv)
+
+    if args.command == 'calibrate':
+        profile = calibrate(args.name, args.images)
+        path = save_profile(profile, args.profiles)
+        print(f"Saved {path}: {profile['geometry'][4]}x{profile['geometry'][5]} board, "
+              f"colours {', '.join(profile['palette'])}, dot radius {profile.get('dot_radius')} cells",
+              file=sys.stderr)
+        return
+
+    detector = CellSampleDetector(load_profile(args.profiles, args.name), cross_check=args.cross_check)
+    for path in args.images:
+        start = time.perf_counter()
+        positions = detector.detect_colors(path)
+        print(json.dumps({'image': path, 'color_positions': {c: p for c, p in positions.items() if p},
+                          'seconds': time.perf_counter() - start}))
+    if args.cross_check:
+        print(f"{detector.mismatches} of {len(args.images)} images disagreed with the contour detector",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,9 @@
-import cv2
-from test import ColorGridDetector
-from FlowFreePuzzleSolver import FlowFreeSolver
+import colorsys
+import os
+import zlib
 
-path = '/Users/tommasocastellanza/Flow Free AI/examples/IMG_5931.PNG'
-
-# Reading the image
-image = cv2.imread(path)
-
-detector = ColorGridDetector(grid_size=(5, 5))
-unscaledColorPositions = detector.detect_unscaled_colors(path)
-scaledColourPositions = detector.detect_colors(path)
+# Path thickness as a fraction of the cell size
+LINE_WIDTH = 0.17
 
 def colorPicker(colour):
     # colours in BGR
@@ -24,103 +18,204 @@ def colorPicker(colour):
     elif colour == 'orange':
         return (0, 137, 248)
     else:
-        return (0, 0, 0)
-
-solver = FlowFreeSolver(5, scaledColourPositions)
-
-print("Solving:")
-if solver.solve():
-    print("✅ Solution found:")
-    print(solver.grid)
-    solver.print_grid()
-else:
-    print("❌ No solution found.")
-
-def find_direction(grid, x, y, colour):
-    # Check all directions with boundary checks
-    if y > 0 and grid[y-1][x] == colour:
-        return 'up'
-    if y < len(grid) - 1 and grid[y+1][x] == colour:
-        return 'down'
-    if x > 0 and grid[y][x-1] == colour:
-        return 'left'
-    if x < len(grid[0]) - 1 and grid[y][x+1] == colour:
-        return 'right'
-    return None
-
-def calculate_square_size():
-    # Calculate pixel size of one grid square (unscaled/scaled ratio)
-    zeroUnscaled = unscaledColorPositions['red'][0][0]
-    oneUnscaled = unscaledColorPositions['red'][1][0]
-    zeroScaled = scaledColourPositions['red'][0][0]
-    oneScaled = scaledColourPositions['red'][1][0]
-
-    top = abs(zeroUnscaled - oneUnscaled)
-    bottom = abs(zeroScaled - oneScaled)
-
-    return int(top / bottom)
-
-def get_valid_start(grid, scaled_positions, colour):
-    if colour not in scaled_positions:
-        print(f"No scaled positions found for {colour}")
-        return None
-    for pos in scaled_positions[colour]:
-        # Swap coordinates here: scaled positions are (row, col) but grid is grid[y][x]
-        x, y = pos[1], pos[0]
-        if grid[y][x] == colour:
-            print(f"Valid start found for {colour} at ({x},{y})")
-            return (x, y)
-    print(f"No valid starting cell found for {colour}")
-    return None
-
-def draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, colour):
-    size = calculate_square_size()
-    grid = solver.grid
-    visited = set()
-
-    start_grid_pos = get_valid_start(grid, scaledColourPositions, colour)
-    if not start_grid_pos:
-        print(f"No valid direction found for {colour}")
-        return image
-
-    x_grid, y_grid = start_grid_pos
-    x_unscaled, y_unscaled = unscaledColorPositions[colour][0]
-    current_pixel = (x_unscaled, y_unscaled)
-
-    # Move through the path step by step
-    stack = [(x_grid, y_grid, current_pixel)]
-
-    while stack:
-        x, y, pixel_pos = stack.pop()
-        visited.add((x, y))
-        
-        #Checks all 4 directions: up, down, left, right.        
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < len(grid[0]) and 0 <= ny < len(grid):
-                if (nx, ny) not in visited and grid[ny][nx] == colour:
-                    # Calculate the next pixel position
-                    next_pixel = (pixel_pos[0] + dx * size, pixel_pos[1] + dy * size)
-
-                    # Draw the line segment
-                    image = cv2.line(image, pixel_pos, next_pixel, colorPicker(colour), thickness=40)
-
-                    # Add next step to stack
-                    stack.append((nx, ny, next_pixel))
-                    break  # move one step at a time like DFS
-
-    return image
-
-# Choose which color to draw for testing
-image = draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, 'blue')
-image = draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, 'red')
-image = draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, 'green')
-image = draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, 'yellow')
-image = draw_lines(image, unscaledColorPositions, scaledColourPositions, solver, 'orange')
-
-# Display the image
-window_name = 'Image'
-cv2.imshow(window_name, image)
-
-cv2.waitKey(0)
-cv2.destroyAllWindows()
\ No newline at end of file
+        # Any other name gets a stable bright colour derived from it
+        hue = (zlib.crc32(colour.encode()) % 360) / 360.0
+        r, g, b = colorsys.hsv_to_rgb(hue, 0.9, 0.95)
+        return (int(b * 255), int(g * 255), int(r * 255))
+
+def _free_neighbours(cell, cells, visited):
+    x, y = cell
+    return [n for n in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)) if n in cells and n not in visited]
+
+def _walk(cells, start, end, max_steps=100000):
+    """
+    Orders one colour's cells into a path from start to end.
+
+    A depth-first search for a route through every cell, trying the
+    neighbour with the fewest onward options first, which finds the path
+    straight away unless it runs alongside itself. Falls back to the
+    shortest route if the search takes more than max_steps.
+    """
+    path = [start]
+    visited = {start}
+    options = [None]
+    steps = 0
+    while path:
+        if path[-1] == end and len(path) == len(cells):
+            return path
+        if options[-1] is None:
+            candidates = [] if path[-1] == end else _free_neighbours(path[-1], cells, visited)
+            # Popped from the end, so the most constrained neighbour goes first
+            candidates.sort(key=lambda cell: len(_free_neighbours(cell, cells, visited)), reverse=True)
+            options[-1] = candidates
+        steps += 1
+        if options[-1] and steps < max_steps:
+            cell = options[-1].pop()
+            path.append(cell)
+            visited.add(cell)
+            options.append(None)
+        else:
+            if steps >= max_steps:
+                break
+            visited.discard(path.pop())
+            options.pop()
+
+    # Shortest route through the colour's cells
+    previous = {start: None}
+    frontier = [start]
+    for cell in frontier:
+        if cell == end:
+            break
+        for nxt in _free_neighbours(cell, cells, previous):
+            previous[nxt] = cell
+            frontier.append(nxt)
+    if end not in previous:
+        return [start]
+    path = [end]
+    while path[-1] != start:
+        path.append(previous[path[-1]])
+    return path[::-1]
+
+def extract_paths(grid, color_positions):
+    """
+    Returns every colour's path through a solved grid in one pass over it.
+
+    Args:
+        grid (list): grid[row][col] colour names, as in FlowFreeSolver.grid.
+        color_positions (dict): {'color': [(row, col), (row, col)]} endpoints.
+
+    Returns:
+        dict: {'color': [(row, col), ...]} from the first endpoint to the second.
+    """
+    cells = {}
+    for row, line in enumerate(grid):
+        for col, colour in enumerate(line):
+            if colour is not None:
+                cells.setdefault(colour, set()).add((row, col))
+
+    paths = {}
+    for colour, positions in color_positions.items():
+        if len(positions) != 2 or colour not in cells:
+            continue
+        start, end = (tuple(p) for p in positions)
+        paths[colour] = _walk(cells[colour], start, end)
+    return paths
+
+def cell_centers(geometry):
+    """Returns a function mapping (row, col) to the pixel centre of that cell."""
+    cell_width = geometry.width / geometry.cols
+    cell_height = geometry.height / geometry.rows
+
+    def center(row, col):
+        return (int(round(geometry.x + (col + 0.5) * cell_width)),
+                int(round(geometry.y + (row + 0.5) * cell_height)))
+    return center
+
+def render_solution(image, grid, color_positions, geometry, thickness=None):
+    """
+    Draws the solution paths onto a copy of the screenshot.
+
+    All paths of the same colour go to OpenCV in one cv2.polylines call.
+
+    Args:
+        image (numpy.ndarray): BGR screenshot.
+        grid (list): Solved grid, grid[row][col].
+        color_positions (dict): {'color': [(row, col), (row, col)]} endpoints.
+        geometry (GridGeometry): Board position and size, from ColorGridDetector.geometry.
+        thickness (int): Line width in pixels. Defaults to LINE_WIDTH of a cell.
+
+    Returns:
+        numpy.ndarray: The image with the paths drawn.
+    """
+    import cv2
+    import numpy as np
+
+    center = cell_centers(geometry)
+    if thickness is None:
+        thickness = max(1, int(LINE_WIDTH * min(geometry.width / geometry.cols, geometry.height / geometry.rows)))
+
+    by_bgr = {}
+    for colour, path in extract_paths(grid, color_positions).items():
+        points = np.array([center(row, col) for row, col in path], dtype=np.int32).reshape(-1, 1, 2)
+        by_bgr.setdefault(colorPicker(colour), []).append(points)
+
+    output = image.copy()
+    for bgr, polylines in by_bgr.items():
+        cv2.polylines(output, polylines, isClosed=False, color=bgr, thickness=thickness, lineType=cv2.LINE_AA)
+    return output
+
+def render_file(image_path, grid, color_positions, geometry, output_path):
+    """Reads image_path, draws the solution and writes it to output_path. Returns False if unreadable."""
+    import cv2
+
+    image = cv2.imread(image_path)
+    if image is None:
+        return False
+    return cv2.imwrite(output_path, render_solution(image, grid, color_positions, geometry))
+
+def render_many(jobs, output_dir, workers=1):
+    """
+    Renders many solutions to files.
+
+    Args:
+        jobs (iterable): (image_path, grid, color_positions, geometry) tuples.
+        output_dir (str): Directory for the rendered images, named after their screenshots.
+        workers (int): Processes to render with.
+
+    Returns:
+        list: Output paths, None where the screenshot couldn't be read.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = []
+    for image_path, grid, color_positions, geometry in jobs:
+        name = os.path.splitext(os.path.basename(image_path))[0] + '_solved.png'
+        tasks.append((image_path, grid, color_positions, geometry, os.path.join(output_dir, name)))
+
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(render_file, *zip(*tasks))) if tasks else []
+    else:
+        written = [render_file(*task) for task in tasks]
+    return [task[-1] if ok else None for task, ok in zip(tasks, written)]
+
+if __name__ == "__main__":
+    import sys
+
+    import cv2
+    from test import ColorGridDetector, square_size
+    from FlowFreePuzzleSolver import FlowFreeSolver
+
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), 'examples', 'IMG_5931.PNG')
+
+    # Reading the image
+    image = cv2.imread(path)
+
+    detector = ColorGridDetector()
+    scaledColourPositions = detector.detect_colors(path)
+    if detector.geometry is None:
+        sys.exit(1)
+
+    try:
+        size = square_size(detector.geometry)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    solver = FlowFreeSolver(size, scaledColourPositions)
+
+    print("Solving:")
+    if solver.solve():
+        print("✅ Solution found:")
+        solver.print_grid()
+        image = render_solution(image, solver.grid, solver.color_positions, detector.geometry)
+    else:
+        print("❌ No solution found.")
+
+    # Display the image
+    window_name = 'Image'
+    cv2.imshow(window_name, image)
+
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
@@ -2,16 +2,19 @@ from tkinter import *
 from tkinterdnd2 import DND_FILES, TkinterDnD
 from PIL import Image, ImageTk
 
-import cv2
-from FlowFreePuzzleSolver import FlowFreeSolver
-from test import ColorGridDetector
-from createImage import draw_lines
-import io
-import sys
+import queue
+import threading
+import time
+from FlowFreePuzzleSolver import FlowFreeSolver, SOLVED, UNSOLVABLE, CANCELLED
+from test import ColorGridDetector, square_size
+from createImage import render_solution
+
+# How often the Tk loop checks the worker for news, in milliseconds
+POLL_MS = 100
 
 root = TkinterDnD.Tk()
 root.title("Flow Free Puzzle Solver")
-root.geometry("800x500")
+root.geometry("1100x550")
 
 # Main layout
 main_frame = Frame(root)
@@ -27,14 +30,16 @@ image_label.pack()
 drop_label = Label(image_frame, text="Drag and drop an image file here", relief="ridge", width=40, height=10)
 drop_label.pack(pady=30)
 
-# Right: Centered text output
+# Right: Centered text output and solved overlay
 text_frame = Frame(main_frame)
-text_frame.pack(side=RIGHT, fill=Y, expand=True)
+text_frame.pack(side=RIGHT, fill=BOTH, expand=True)
 
 # Use pack() instead of place() for better layout handling
 text_inner_frame = Frame(text_frame)
 text_inner_frame.pack(expand=True)
 
+progress_label = Label(text_inner_frame, font=("Courier", 12))
+
 text_box = Text(
     text_inner_frame,
     width=25,
@@ -43,12 +48,18 @@ text_box = Text(
     state=DISABLED,
 )
 
+overlay_label = Label(text_inner_frame)
+
 
 # Buttons
 stop_button = None
 back_button = None
+cancel_button = None
 dropped_image_path = None
 
+# The solve in progress: its message queue, cancel event and start time
+current_job = None
+
 def drop(event):
     global stop_button, back_button, dropped_image_path
     filepath = event.data.strip('{}')
@@ -74,39 +85,148 @@ def drop(event):
     except Exception as e:
         image_label.config(text=f"Error: {e}")
 
+def solve_worker(path, cancel, messages):
+    """
+    Detects and solves the puzzle off the Tk thread.
+
+    Posts ('progress', event), then ('done', (result, text, overlay)) or
+    ('error', message) to messages. Tk widgets are never touched here.
+    """
+    import cv2
+
+    try:
+        detector = ColorGridDetector()
+        color_positions = detector.detect_colors(path)
+        if detector.geometry is None:
+            messages.put(('error', f"Could not read {path}"))
+            return
+
+        solver = FlowFreeSolver(square_size(detector.geometry), color_positions)
+        result = solver.solve_budgeted(cancel=cancel, progress_interval=POLL_MS / 1000,
+                                       on_progress=lambda event: messages.put(('progress', event)))
+        text = solver.format_grid(result.grid) if result.grid else ""
+
+        overlay = None
+        if result.status == SOLVED:
+            try:
+                image = render_solution(cv2.imread(path), solver.grid, solver.color_positions, detector.geometry)
+                overlay = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+                overlay.thumbnail((400, 300))
+            except Exception as e:
+                print(f"Could not draw the solution: {e}")
+        messages.put(('done', (result, text, overlay)))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
 def process_image():
+    global current_job, cancel_button
     if not dropped_image_path:
         print("❌ No image path available!")
         return
+    if current_job:
+        return
 
     print(f"📷 Processing: {dropped_image_path}")
 
-    detector = ColorGridDetector(grid_size=(5, 5))
-    color_positions = detector.detect_colors(dropped_image_path)
-
-    solver = FlowFreeSolver(5, color_positions)
+    messages = queue.Queue()
+    cancel = threading.Event()
+    current_job = (messages, cancel, time.monotonic())
+    threading.Thread(target=solve_worker, args=(dropped_image_path, cancel, messages), daemon=True).start()
+
+    stop_button.config(state=DISABLED)
+    if not cancel_button:
+        cancel_button = Button(image_frame, text='Cancel', width=25, command=cancel_solve)
+        cancel_button.pack(pady=5)
+    show_text("Solving...")
+    show_overlay(None)
+    if not progress_label.winfo_ismapped():
+        progress_label.pack(before=text_box if text_box.winfo_ismapped() else None)
+    root.after(POLL_MS, poll_worker, current_job)
+
+def poll_worker(job):
+    if job is not current_job:
+        # The UI was reset, drop whatever that solve still sends
+        return
+    messages, _, started = job
+    nodes = None
+    while True:
+        try:
+            kind, payload = messages.get_nowait()
+        except queue.Empty:
+            break
+        if kind == 'progress':
+            nodes = payload['nodes']
+        else:
+            finish_job(kind, payload, time.monotonic() - started)
+            return
+
+    elapsed = time.monotonic() - started
+    if nodes is not None:
+        progress_label.config(text=f"Nodes: {nodes:,}  Elapsed: {elapsed:.1f}s")
+    elif not progress_label.cget('text').startswith("Nodes"):
+        progress_label.config(text=f"Elapsed: {elapsed:.1f}s")
+    root.after(POLL_MS, poll_worker, job)
+
+def finish_job(kind, payload, elapsed):
+    global current_job, cancel_button
+    current_job = None
+    if cancel_button:
+        cancel_button.destroy()
+        cancel_button = None
+    if stop_button:
+        stop_button.config(state=NORMAL)
 
-    output = io.StringIO()
-    sys.stdout = output  # Redirect print
+    if kind == 'error':
+        progress_label.config(text=f"Elapsed: {elapsed:.1f}s")
+        show_text(f"❌ Error: {payload}")
+        return
 
-    if solver.solve():
-        print("✅ Solution found:")
-        solver.print_grid()
+    result, text, overlay = payload
+    progress_label.config(text=f"Nodes: {result.nodes:,}  Elapsed: {elapsed:.1f}s")
+    if result.status == SOLVED:
+        show_text("✅ Solution found:\n" + text)
+        show_overlay(overlay)
+    elif result.status == UNSOLVABLE:
+        show_text("❌ No solution found.")
+    elif result.status == CANCELLED:
+        show_text("⏹ Cancelled. Best partial board:\n" + text)
     else:
-        print("❌ No solution found.")
+        show_text("⏱ Gave up. Best partial board:\n" + text)
 
-    sys.stdout = sys.__stdout__  # Restore
+def cancel_solve():
+    if current_job:
+        current_job[1].set()
+        cancel_button.config(state=DISABLED)
 
-    text_box.config(state=NORMAL)
+def show_text(text):
+    lines = text.splitlines() or [""]
+    text_box.config(state=NORMAL, width=max(25, max(len(line) for line in lines) + 2),
+                    height=max(10, len(lines) + 1))
     text_box.delete("1.0", END)
-    text_box.insert(END, output.getvalue())
+    text_box.insert(END, text)
     text_box.config(state=DISABLED)
     # Show the text box if it's not already packed
     if not text_box.winfo_ismapped():
-        text_box.pack(pady=20)
+        text_box.pack(side=LEFT, pady=20)
+
+def show_overlay(overlay):
+    if overlay is None:
+        overlay_label.config(image='')
+        overlay_label.image = None
+        overlay_label.pack_forget()
+        return
+    photo = ImageTk.PhotoImage(overlay)
+    overlay_label.config(image=photo)
+    overlay_label.image = photo
+    overlay_label.pack(side=LEFT, padx=20)
 
 def reset_ui():
-    global stop_button, back_button, dropped_image_path
+    global stop_button, back_button, cancel_button, dropped_image_path, current_job
+
+    # Let a running solve wind down in the background
+    if current_job:
+        current_job[1].set()
+        current_job = None
 
     image_label.config(image='', text='')
     image_label.image = None
@@ -115,6 +235,9 @@ def reset_ui():
     text_box.config(state=NORMAL)
     text_box.delete("1.0", END)
     text_box.config(state=DISABLED)
+    show_overlay(None)
+    progress_label.config(text='')
+    progress_label.pack_forget()
 
     if stop_button:
         stop_button.destroy()
@@ -122,6 +245,9 @@ def reset_ui():
     if back_button:
         back_button.destroy()
         back_button = None
+    if cancel_button:
+        cancel_button.destroy()
+        cancel_button = None
 
     drop_label.pack(pady=30)
 
@@ -129,4 +255,4 @@ def reset_ui():
 drop_label.drop_target_register(DND_FILES)
 drop_label.dnd_bind('<<Drop>>', drop)
 
-root.mainloop()
\ No newline at end of file
+root.mainloop()
@@ -0,0 +1,359 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+# Container layout, all little-endian:
+#   puzzle file:   header | records | color names (JSON) | index of count + 1 uint64 record offsets
+#   solution file: header | count fixed-size slots, slot i answering puzzle i
+# A puzzle record is size, color count and then (color id, x1, y1, x2, y2)
+# per color, one byte each. A solution slot is status, size and one byte per
+# cell of the largest board, holding color id + 1 and 0 for an empty cell.
+PUZZLE_MAGIC = b'FFPZ'
+SOLUTION_MAGIC = b'FFSL'
+VERSION = 1
+PUZZLE_HEADER = struct.Struct('<4sHHQQQ')  # magic, version, max size, count, names offset, index offset
+SOLUTION_HEADER = struct.Struct('<4sHHQ')  # magic, version, max size, count
+RECORD_HEADER = struct.Struct('<BB')
+
+# Solution slot status bytes
+PENDING, SOLVED, UNSOLVABLE, TIMEOUT, ERROR = range(5)
+STATUS_NAMES = ('pending', 'solved', 'unsolvable', 'timeout', 'error')
+
+
+def pack_puzzle(size, color_positions, color_ids):
+    """
+    Packs a puzzle into its binary record.
+
+    Args:
+        size (int): Board width and height, at most 255.
+        color_positions (dict): {'color': [(x, y), (x, y)]}.
+        color_ids (dict): {'color': id} for the container's color table; new colors are added.
+
+    Returns:
+        bytes: The record.
+    """
+    colors = [color for color, positions in color_positions.items() if positions]
+    if not 0 < size < 256:
+        raise ValueError(f"Board size must be between 1 and 255, got {size}")
+    record = bytearray(RECORD_HEADER.pack(size, len(colors)))
+    for color in colors:
+        positions = color_positions[color]
+        if len(positions) != 2:
+            raise ValueError(f"Color {color!r} needs exactly two endpoints, got {len(positions)}")
+        color_id = color_ids.setdefault(color, len(color_ids))
+        if color_id > 254:
+            raise ValueError("At most 255 distinct colors fit in one container")
+        (x1, y1), (x2, y2) = positions
+        record += bytes((color_id, x1, y1, x2, y2))
+    return bytes(record)
+
+
+def unpack_puzzle(record, names):
+    """
+    Turns a binary record back into (size, color_positions).
+
+    Args:
+        record (bytes): A record from pack_puzzle, or a memoryview of one.
+        names (list): Color names by id.
+    """
+    size, colors = RECORD_HEADER.unpack_from(record)
+    color_positions = {}
+    for offset in range(RECORD_HEADER.size, RECORD_HEADER.size + 5 * colors, 5):
+        color_id, x1, y1, x2, y2 = record[offset:offset + 5]
+        color_positions[names[color_id]] = [(x1, y1), (x2, y2)]
+    return size, color_positions
+
+
+def pack_solution(grid, color_ids):
+    """
+    Packs a solved grid into one color id + 1 byte per cell, 0 for an empty cell.
+
+    Args:
+        grid (list): grid[x][y] color names, as in FlowFreeSolver.grid.
+        color_ids (dict): {'color': id}.
+    """
+    packed = bytearray(len(grid) * len(grid))
+    i = 0
+    for row in grid:
+        for color in row:
+            if color is not None:
+                packed[i] = color_ids[color] + 1
+            i += 1
+    return bytes(packed)
+
+
+def unpack_solution(cells, size, names):
+    """Turns packed cells back into a grid[x][y] of color names."""
+    return [[names[cells[x * size + y] - 1] if cells[x * size + y] else None for y in range(size)]
+            for x in range(size)]
+
+
+def write_puzzles(path, puzzles):
+    """
+    Writes puzzles to an indexed container, streaming them to disk.
+
+    Args:
+        path (str): File to write.
+        puzzles (iterable): (size, color_positions) pairs.
+
+    Returns:
+        int: Number of puzzles written.
+    """
+    color_ids = {}
+    offsets = array('Q', [0])
+    max_size = 0
+    with open(path, 'wb') as f:
+        f.write(bytes(PUZZLE_HEADER.size))
+        for size, color_positions in puzzles:
+            record = pack_puzzle(size, color_positions, color_ids)
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+            max_size = max(max_size, size)
+
+        names_offset = f.tell()
+        f.write(json.dumps(list(color_ids)).encode())
+        index_offset = f.tell()
+        # The index is read in place as uint64s, so keep it 8-byte aligned
+        padding = -index_offset % 8
+        f.write(bytes(padding))
+        index_offset += padding
+        f.write(offsets.tobytes())
+
+        count = len(offsets) - 1
+        f.seek(0)
+        f.write(PUZZLE_HEADER.pack(PUZZLE_MAGIC, VERSION, max_size, count, names_offset, index_offset))
+    return count
+
+
+class PuzzleFile:
+    """
+    Read-only view of a puzzle container through mmap.
+
+    Records are handed out as memoryviews into the mapping, so iterating a
+    file of millions of boards copies nothing until a record is unpacked.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_size, self.count, names_offset, index_offset = \
+            PUZZLE_HEADER.unpack_from(self.map)
+        if magic != PUZZLE_MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a version {VERSION} puzzle file")
+        self.view = memoryview(self.map)
+        self.names = json.loads(bytes(self.view[names_offset:index_offset]).rstrip(b'\0'))
+        self.offsets = self.view[index_offset:index_offset + 8 * (self.count + 1)].cast('Q')
+        self.records = self.view[PUZZLE_HEADER.size:names_offset]
+
+    def __len__(self):
+        return self.count
+
+    def record(self, i):
+        """Returns record i as a memoryview, without copying."""
+        return self.records[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        """Returns puzzle i as (size, color_positions)."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return unpack_puzzle(self.record(i), self.names)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        # Views into the mapping must go before the mapping can close
+        self.offsets.release()
+        self.records.release()
+        self.view.release()
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SolutionFile:
+    """
+    Fixed-slot solution container, written in place through mmap.
+
+    Slot i belongs to puzzle i of the matching PuzzleFile, so any number of
+    processes can fill disjoint slots of one file at the same time.
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        with open(path, 'r+b' if writable else 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, self.max_size, self.count = SOLUTION_HEADER.unpack_from(self.map)
+        if magic != SOLUTION_MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is not a version {VERSION} solution file")
+        self.slot_size = 2 + self.max_size * self.max_size
+
+    @classmethod
+    def create(cls, path, count, max_size):
+        """Creates a file of count pending slots for boards up to max_size and opens it for writing."""
+        with open(path, 'wb') as f:
+            f.write(SOLUTION_HEADER.pack(SOLUTION_MAGIC, VERSION, max_size, count))
+            # Sparse on most filesystems; unwritten slots read as PENDING
+            f.truncate(SOLUTION_HEADER.size + count * (2 + max_size * max_size))
+        return cls(path, writable=True)
+
+    def __len__(self):
+        return self.count
+
+    def _offset(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return SOLUTION_HEADER.size + i * self.slot_size
+
+    def write(self, i, status, size, cells=b''):
+        """Fills slot i with a status, the board size and its packed cells."""
+        offset = self._offset(i)
+        self.map[offset:offset + 2] = bytes((status, size))
+        if cells:
+            self.map[offset + 2:offset + 2 + len(cells)] = cells
+
+    def read(self, i):
+        """Returns (status, size, cells) for slot i; cells is a size * size bytes copy."""
+        offset = self._offset(i)
+        status, size = self.map[offset], self.map[offset + 1]
+        return status, size, self.map[offset + 2:offset + 2 + size * size]
+
+    def grid(self, i, names):
+        """Returns slot i's grid of color names, or None if it isn't solved."""
+        status, size, cells = self.read(i)
+        return unpack_solution(cells, size, names) if status == SOLVED else None
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _solve_range(puzzle_path, solution_path, start, end, timeout, options):
+    """Solves puzzles start..end-1 and writes their slots. Returns status counts."""
+    from FlowFreePuzzleSolver import FlowFreeSolver
+
+    statuses = {'solved': SOLVED, 'unsolvable': UNSOLVABLE, 'timeout': TIMEOUT, 'cancelled': TIMEOUT}
+    counts = [0] * len(STATUS_NAMES)
+    with PuzzleFile(puzzle_path) as puzzles, SolutionFile(solution_path, writable=True) as solutions:
+        color_ids = {name: i for i, name in enumerate(puzzles.names)}
+        for i in range(start, end):
+            size, color_positions = puzzles[i]
+            try:
+                result = FlowFreeSolver(size, color_positions, **options).solve_budgeted(timeout=timeout)
+                status = statuses[result.status]
+            except Exception as e:
+                print(f"Puzzle {i}: {e}", file=sys.stderr)
+                status = ERROR
+            packed = pack_solution(result.grid, color_ids) if status == SOLVED else b''
+            solutions.write(i, status, size, packed)
+            counts[status] += 1
+    return counts
+
+
+def bulk_solve(puzzle_path, solution_path, workers=1, timeout=None, chunk=256, options=None):
+    """
+    Solves every puzzle in a container into a parallel solution file.
+
+    Each worker maps both files itself and writes its own slots, so boards
+    and grids never travel between processes.
+
+    Args:
+        puzzle_path (str): Puzzle container from write_puzzles.
+        solution_path (str): Solution file to create, one slot per puzzle.
+        workers (int): Processes to solve in.
+        timeout (float): Seconds allowed per puzzle. Defaults to None.
+        chunk (int): Puzzles per task.
+        options (dict): Extra FlowFreeSolver arguments, such as ordering.
+
+    Returns:
+        dict: Number of puzzles per status.
+    """
+    with PuzzleFile(puzzle_path) as puzzles:
+        count, max_size = len(puzzles), puzzles.max_size
+    SolutionFile.create(solution_path, count, max_size).close()
+
+    ranges = [(start, min(start + chunk, count)) for start in range(0, count, chunk)]
+    jobs = [(puzzle_path, solution_path, start, end, timeout, options or {}) for start, end in ranges]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_solve_range, *zip(*jobs))) if jobs else []
+    else:
+        results = [_solve_range(*job) for job in jobs]
+
+    totals = [sum(counts) for counts in zip(*results)] if results else [0] * len(STATUS_NAMES)
+    return dict(zip(STATUS_NAMES, totals))
+
+
+def _read_jsonl(path):
+    """Yields (size, color_positions) from JSONL records with 'size' or 'grid_size' keys."""
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record.get('size', record.get('grid_size')), record['color_positions']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack, bulk-solve and unpack Flow Free puzzle containers.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    pack = commands.add_parser('pack', help="Pack JSONL puzzles (puzzleGenerator or batchSolve output)")
+    pack.add_argument('jsonl')
+    pack.add_argument('output')
+    solve = commands.add_parser('solve', help="Solve every puzzle in a container")
+    solve.add_argument('puzzles')
+    solve.add_argument('solutions')
+    solve.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    solve.add_argument('--timeout', type=float, help="Seconds allowed per puzzle")
+    solve.add_argument('--chunk', type=int, default=256, help="Puzzles per task")
+    solve.add_argument('--ordering', default='mrv', choices=('fixed', 'mrv'))
+    dump = commands.add_parser('dump', help="Write a container, and its solutions, as JSONL")
+    dump.add_argument('puzzles')
+    dump.add_argument('solutions', nargs='?')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == 'pack':
+        count = write_puzzles(args.output, _read_jsonl(args.jsonl))
+        print(f"Packed {count} puzzles into {args.output} ({os.path.getsize(args.output)} bytes)", file=sys.stderr)
+    elif args.command == 'solve':
+        counts = bulk_solve(args.puzzles, args.solutions, args.workers, args.timeout, args.chunk,
+                            {'ordering': args.ordering})
+        total = sum(counts.values())
+        elapsed = time.perf_counter() - start
+        print(f"Solved {counts['solved']}/{total} puzzles in {elapsed:.1f}s "
+              f"({total / elapsed if elapsed else 0:.1f} puzzles/s): {counts}", file=sys.stderr)
+    else:
+        solutions = SolutionFile(args.solutions) if args.solutions else None
+        with PuzzleFile(args.puzzles) as puzzles:
+            for i, (size, color_positions) in enumerate(puzzles):
+                record = {'size': size, 'color_positions': color_positions}
+                if solutions is not None:
+                    status, _, _ = solutions.read(i)
+                    record.update(status=STATUS_NAMES[status], grid=solutions.grid(i, puzzles.names))
+                print(json.dumps(record))
+        if solutions is not None:
+            solutions.close()
+
+
+if __name__ == "__main__":
+    main()
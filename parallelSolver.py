@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from FlowFreePuzzleSolver import FlowFreeSolver, SolveStats
+
+# Index of the earliest subproblem known to be solved, shared with the workers
+_best = None
+
+
+def _init_worker(best):
+    global _best
+    _best = best
+
+
+def solver_options(solver):
+    """Returns the keyword arguments needed to rebuild solver in another process."""
+    return {
+        'propagate': solver.propagate,
+        'ordering': solver.ordering,
+        'decompose': solver.decompose,
+        'tt_size': solver.dead_states.max_entries if solver.dead_states is not None else 0,
+    }
+
+
+def split(solver, min_tasks, max_levels=32):
+    """
+    Expands the top of the search tree into independent subproblems.
+
+    Whole levels are expanded until there are at least min_tasks states, so the
+    returned list keeps the order in which the serial dfs would visit them.
+
+    Returns:
+        list: Search state snapshots.
+    """
+    root = solver.snapshot()
+    frontier = [root]
+    for _ in range(max_levels):
+        if len(frontier) >= min_tasks:
+            break
+        expanded = []
+        grew = False
+        for state in frontier:
+            solver.restore(state)
+            if not solver.active:
+                # Already a full board, keep it as its own task
+                expanded.append(state)
+                continue
+            children = solver.expand()
+            expanded.extend(children)
+            grew = True
+        frontier = expanded
+        if not grew:
+            break
+    solver.restore(root)
+    return frontier
+
+
+def _solve_task(index, size, color_positions, options, state, with_stats=False):
+    solver = FlowFreeSolver(size, color_positions, **options)
+    filled, unfinished = bin(solver.occupied).count('1'), len(solver.active)
+    solver.restore(state)
+    stats = None
+    if with_stats:
+        stats = SolveStats()
+        stats.reset(solver.colors)
+        # Depth counts from the root, not from this subproblem
+        stats.depth = stats.max_depth = (bin(solver.occupied).count('1') - filled
+                                         + unfinished - len(solver.active))
+        solver._instrument(stats)
+    # Give up as soon as an earlier subproblem has been solved
+    solver.stop = lambda: _best.value < index
+    solved = solver.dfs()
+    if solved:
+        solver._write_grid()
+        with _best.get_lock():
+            if index < _best.value:
+                _best.value = index
+    if stats is not None:
+        if solver.dead_states is not None:
+            stats.tt_pruned = solver.dead_states.hits
+        stats = stats.as_dict()
+    return index, solved, solver.grid if solved else None, solver.nodes, stats
+
+
+def solve_parallel(solver, workers=None, tasks_per_worker=4):
+    """
+    Solves with a pool of processes and writes the solution into solver.grid.
+
+    The subproblems are handed out through the pool's shared queue, so idle
+    workers pick up the next one. Once subproblem i is solved every later
+    subproblem is cancelled, and the earliest solved one wins, which makes
+    the grid identical to the serial solver's.
+
+    Args:
+        solver (FlowFreeSolver): Freshly constructed solver.
+        workers (int): Number of processes. Defaults to os.cpu_count().
+        tasks_per_worker (int): Subproblems to create per worker, for load balancing.
+
+    Returns:
+        bool: True if a solution was found.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = split(solver, workers * tasks_per_worker)
+    if not tasks:
+        return False
+
+    best = multiprocessing.Value('i', len(tasks))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(best,)) as pool:
+        pending = {
+            pool.submit(_solve_task, i, solver.size, solver.color_positions,
+                        solver_options(solver), state, solver.stats is not None): i
+            for i, state in enumerate(tasks)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                del pending[future]
+                index, solved, grid, nodes, stats = future.result()
+                solver.nodes += nodes
+                if stats is not None:
+                    solver.stats.merge(stats)
+                if solved:
+                    results[index] = grid
+            if results:
+                # Queued subproblems after the earliest solution are not needed
+                first = min(results)
+                for future, index in list(pending.items()):
+                    if index > first and future.cancel():
+                        del pending[future]
+
+    if not results:
+        return False
+    solver.grid = results[min(results)]
+    return True
+
+
+def speedup_report(size, color_positions, core_counts=(1, 2, 4, 8, 16), **options):
+    """
+    Times the serial solver and solve_parallel for each core count and prints the speedups.
+
+    Returns:
+        list: [(workers, seconds, speedup)], with workers 0 for the serial run.
+    """
+    solver = FlowFreeSolver(size, color_positions, **options)
+    start = time.perf_counter()
+    solver.solve()
+    serial = time.perf_counter() - start
+    rows = [(0, serial, 1.0)]
+    reference = solver.grid
+
+    for workers in core_counts:
+        solver = FlowFreeSolver(size, color_positions, **options)
+        start = time.perf_counter()
+        solver.solve(workers=workers)
+        elapsed = time.perf_counter() - start
+        if solver.grid != reference:
+            raise RuntimeError(f"Parallel solve with {workers} workers returned a different grid")
+        rows.append((workers, elapsed, serial / elapsed if elapsed else float('inf')))
+
+    print(f"{'workers':>8}{'seconds':>10}{'speedup':>9}")
+    for workers, elapsed, speedup in rows:
+        print(f"{workers or 'serial':>8}{elapsed:>10.3f}{speedup:>9.2f}")
+    return rows
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Colour names handed out to generated paths, in order
+COLOR_NAMES = ('red', 'green', 'blue', 'yellow', 'orange', 'cyan', 'magenta', 'maroon',
+               'purple', 'white', 'grey', 'lime', 'tan', 'navy', 'pink', 'brown')
+
+
+def _neighbours(size, x, y):
+    return [(nx, ny) for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))
+            if 0 <= nx < size and 0 <= ny < size]
+
+
+def random_hamiltonian_path(size, rng, moves=None):
+    """
+    Returns a random path through every cell of the board.
+
+    Starts from a zigzag and applies backbite moves: an end of the path
+    steps onto one of its neighbours and the part of the path it cuts off
+    is reversed, which keeps the path covering every cell.
+
+    Args:
+        size (int): Board width and height.
+        rng (random.Random): Source of randomness.
+        moves (int): Backbite moves to apply. Defaults to 20 per cell.
+
+    Returns:
+        list: (x, y) cells in path order.
+    """
+    path = [(x, y if x % 2 == 0 else size - 1 - y) for x in range(size) for y in range(size)]
+    if size < 2:
+        return path
+    if moves is None:
+        moves = 20 * size * size
+
+    for _ in range(moves):
+        if rng.random() < 0.5:
+            path.reverse()
+        # Backbite at the head: step onto a neighbour and reverse what it cuts off
+        head = path[0]
+        target = rng.choice(_neighbours(size, *head))
+        if target == path[1]:
+            continue
+        i = path.index(target)
+        path[:i] = path[i - 1::-1]
+    return path
+
+
+def _split_where_touching(path):
+    """Cuts path into the longest pieces, in order, that don't run alongside themselves."""
+    pieces = [[path[0]]]
+    inside = set()  # cells of the current piece before its last one
+    for x, y in path[1:]:
+        if any(n in inside for n in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1))):
+            pieces.append([(x, y)])
+            inside = set()
+        else:
+            inside.add(pieces[-1][-1])
+            pieces[-1].append((x, y))
+    return pieces
+
+
+def random_path_cover(size, colors, rng, min_length=3):
+    """
+    Splits a random Hamiltonian path into colors paths that fill the board.
+
+    The path is first cut wherever it would run alongside itself, since a
+    path with such a shortcut almost always lets a second solution through.
+    Pieces are then split at random until there are colors of them.
+
+    Args:
+        size (int): Board width and height.
+        colors (int): Number of paths.
+        rng (random.Random): Source of randomness.
+        min_length (int): Fewest cells per path.
+
+    Returns:
+        list: One list of (x, y) cells per path in path order, or None if this
+            Hamiltonian path can't be cut that way; try again.
+    """
+    if colors < 1 or colors * min_length > size * size:
+        raise ValueError(f"Can't fit {colors} paths of {min_length}+ cells on a {size}x{size} board")
+    pieces = _split_where_touching(random_hamiltonian_path(size, rng))
+    if len(pieces) > colors or any(len(piece) < min_length for piece in pieces):
+        return None
+
+    while len(pieces) < colors:
+        splittable = [i for i, piece in enumerate(pieces) if len(piece) >= 2 * min_length]
+        if not splittable:
+            return None
+        i = rng.choice(splittable)
+        cut = rng.randint(min_length, len(pieces[i]) - min_length)
+        pieces[i:i + 1] = [pieces[i][:cut], pieces[i][cut:]]
+    return pieces
+
+
+def generate_board(size, colors, rng=None, unique=True, max_attempts=1000):
+    """
+    Generates one puzzle by cutting a random board-filling path into colors pieces.
+
+    With unique set, every candidate is checked with solutionCounter and
+    only a puzzle with exactly one solution is returned.
+
+    Args:
+        size (int): Board width and height.
+        colors (int): Number of colors, at most len(COLOR_NAMES).
+        rng (random.Random): Source of randomness. Defaults to a fresh one.
+        unique (bool): Only accept puzzles with exactly one solution.
+        max_attempts (int): Candidates to try before giving up.
+
+    Returns:
+        tuple: (color_positions, grid, attempts), color_positions and grid being
+            None if no puzzle was accepted within max_attempts.
+    """
+    if colors > len(COLOR_NAMES):
+        raise ValueError(f"At most {len(COLOR_NAMES)} colors are supported, got {colors}")
+    if unique:
+        from solutionCounter import uniqueness
+    rng = rng or random.Random()
+
+    for attempt in range(1, max_attempts + 1):
+        paths = random_path_cover(size, colors, rng)
+        if paths is None:
+            continue
+        color_positions = {name: [path[0], path[-1]] for name, path in zip(COLOR_NAMES, paths)}
+        if unique and uniqueness(size, color_positions) != 1:
+            continue
+
+        grid = [[None] * size for _ in range(size)]
+        for name, path in zip(COLOR_NAMES, paths):
+            for x, y in path:
+                grid[x][y] = name
+        return color_positions, grid, attempt
+    return None, None, max_attempts
+
+
+def _generate_task(size, colors, seed, unique, max_attempts):
+    start = time.perf_counter()
+    color_positions, grid, attempts = generate_board(size, colors, random.Random(seed), unique, max_attempts)
+    return color_positions, grid, attempts, time.perf_counter() - start
+
+
+def generate(size, colors, count, workers=1, seed=None, unique=True, max_attempts=1000):
+    """
+    Yields count generated puzzles as they come out of the worker processes.
+
+    Args:
+        size (int): Board width and height.
+        colors (int): Number of colors per puzzle.
+        count (int): Puzzles to produce.
+        workers (int): Processes to generate in.
+        seed (int): Seeds the per-task seeds, which are recorded so any puzzle can be regenerated.
+        unique (bool): Only emit puzzles with exactly one solution.
+        max_attempts (int): Candidates each task tries before it is retried with a new seed.
+
+    Yields:
+        dict: {'size', 'color_positions', 'grid', 'attempts', 'seconds', 'seed'} records.
+
+    Raises:
+        ValueError: If the first tasks all come back empty, which means boards
+            of this size rarely split into this few unique paths.
+    """
+    seeds = random.Random(seed)
+    emitted = 0
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while emitted < count:
+            # Keep a couple of tasks queued per worker so none sits idle
+            while len(pending) < min(2 * workers, count - emitted + workers):
+                task_seed = seeds.getrandbits(63)
+                future = pool.submit(_generate_task, size, colors, task_seed, unique, max_attempts)
+                pending[future] = task_seed
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_seed = pending.pop(future)
+                color_positions, grid, attempts, seconds = future.result()
+                if color_positions is None:
+                    failures += 1
+                    if not emitted and failures >= 4 * workers:
+                        raise ValueError(f"No {size}x{size} puzzle with {colors} colors found in "
+                                         f"{failures * max_attempts} attempts; try more colors")
+                    continue
+                if emitted >= count:
+                    continue
+                emitted += 1
+                yield {
+                    'size': size,
+                    'color_positions': color_positions,
+                    'grid': grid,
+                    'attempts': attempts,
+                    'seconds': seconds,
+                    'seed': task_seed,
+                }
+        for future in pending:
+            future.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate random Flow Free puzzles.")
+    parser.add_argument('size', type=int, help="Board width and height")
+    parser.add_argument('colors', type=int, help="Colors per puzzle")
+    parser.add_argument('-n', '--count', type=int, default=10, help="Puzzles to generate")
+    parser.add_argument('-o', '--output', help="JSONL file to write (default: stdout)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, help="Seed for a repeatable run")
+    parser.add_argument('--allow-multiple', action='store_true', help="Skip the unique-solution check")
+    parser.add_argument('--max-attempts', type=int, default=1000, help="Candidates per task before reseeding")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    produced = 0
+    try:
+        for record in generate(args.size, args.colors, args.count, args.workers, args.seed,
+                               not args.allow_multiple, args.max_attempts):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            produced += 1
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        if args.output:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Generated {produced} puzzles in {elapsed:.1f}s ({produced / elapsed if elapsed else 0:.2f} puzzles/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+import heapq
+
+from FlowFreePuzzleSolver import DIRECTIONS
+
+# Path cell shapes as pairs of DIRECTIONS indices: │ ─ ┘ └ ┐ ┌
+CELL_TYPES = [(0, 1), (2, 3), (0, 2), (0, 3), (1, 2), (1, 3)]
+
+
+def luby(i):
+    """Returns the i-th element (1-based) of the Luby restart sequence."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class CDCLSolver:
+    """
+    Small conflict-driven clause learning SAT solver.
+
+    Variables are positive integers. Clauses are lists of DIMACS-style
+    literals (v for true, -v for false). Internally literal v is stored
+    as 2 * v and -v as 2 * v + 1, so negation is a xor with 1.
+    """
+
+    def __init__(self, restart_base=100):
+        self.num_vars = 0
+        self.clauses = []
+        self.learned = []
+        self.watches = [[], []]
+        self.implies = [[], []]  # binary clauses as literal -> implied literals
+        self.value = [0, 0]  # per literal: 1 true, -1 false, 0 unassigned
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.seen = [False]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.heap = []
+        self.var_inc = 1.0
+        self.restart_base = restart_base
+        self.ok = True
+        # Optional callable polled every 256 conflicts; returning True abandons the search
+        self.stop = None
+
+        # Statistics
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+
+    def new_var(self):
+        self.num_vars += 1
+        self.watches.extend(([], []))
+        self.implies.extend(([], []))
+        self.value.extend((0, 0))
+        self.level.append(0)
+        self.reason.append(None)
+        self.activity.append(0.0)
+        self.phase.append(False)
+        self.seen.append(False)
+        heapq.heappush(self.heap, (0.0, self.num_vars))
+        return self.num_vars
+
+    def add_clause(self, literals):
+        """
+        Adds a clause at decision level 0.
+
+        Args:
+            literals (iterable): DIMACS-style literals.
+
+        Returns:
+            bool: False if the formula is now known to be unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self._cancel_until(0)
+
+        clause = []
+        for lit in set(literals):
+            internal = 2 * lit if lit > 0 else -2 * lit + 1
+            if internal ^ 1 in clause or self.value[internal] == 1:
+                return True  # tautology or already satisfied
+            if self.value[internal] == 0:
+                clause.append(internal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self._assign(clause[0], None)
+            self.ok = self._propagate() is None
+        elif len(clause) == 2:
+            self._add_binary(clause)
+        else:
+            self.clauses.append(clause)
+            self._watch(clause)
+        return self.ok
+
+    def _add_binary(self, clause):
+        a, b = clause
+        self.implies[a ^ 1].append(b)
+        self.implies[b ^ 1].append(a)
+
+    def _watch(self, clause):
+        self.watches[clause[0] ^ 1].append(clause)
+        self.watches[clause[1] ^ 1].append(clause)
+
+    def _assign(self, lit, reason):
+        var = lit >> 1
+        self.value[lit] = 1
+        self.value[lit ^ 1] = -1
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(lit)
+
+    def _propagate(self):
+        """Unit propagation with two watched literals. Returns a conflicting clause or None."""
+        value = self.value
+        watches = self.watches
+        implies = self.implies
+        trail = self.trail
+        while self.qhead < len(trail):
+            lit = trail[self.qhead]
+            self.qhead += 1
+            self.propagations += 1
+            false_lit = lit ^ 1
+
+            for other in implies[lit]:
+                if value[other] == 1:
+                    continue
+                if value[other] == -1:
+                    return [other, false_lit]
+                self._assign(other, [other, false_lit])
+            watching = watches[lit]
+            kept = []
+            i = 0
+            n = len(watching)
+            while i < n:
+                clause = watching[i]
+                i += 1
+                # Keep the false literal in slot 1
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value[first] == 1:
+                    kept.append(clause)
+                    continue
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    if value[other] != -1:
+                        clause[1] = other
+                        clause[k] = false_lit
+                        watches[other ^ 1].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value[first] == -1:
+                        kept.extend(watching[i:])
+                        watches[lit] = kept
+                        return clause
+                    self._assign(first, clause)
+            watches[lit] = kept
+        return None
+
+    def _analyze(self, conflict):
+        """First-UIP conflict analysis. Returns the learned clause and backjump level."""
+        seen = self.seen
+        level = self.level
+        current = len(self.trail_lim)
+        learned = [None]
+        counter = 0
+        lit = None
+        index = len(self.trail) - 1
+        clause = conflict
+        marked = []
+
+        while True:
+            for other in clause:
+                if other == lit:
+                    continue
+                var = other >> 1
+                if not seen[var] and level[var] > 0:
+                    seen[var] = True
+                    marked.append(var)
+                    self._bump(var)
+                    if level[var] >= current:
+                        counter += 1
+                    else:
+                        learned.append(other)
+            # Walk back to the next marked literal on the trail
+            while not seen[self.trail[index] >> 1]:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.reason[lit >> 1]
+
+        learned[0] = lit ^ 1
+        for var in marked:
+            seen[var] = False
+
+        if len(learned) == 1:
+            return learned, 0
+        # Put the literal with the highest level in slot 1
+        best = max(range(1, len(learned)), key=lambda k: level[learned[k] >> 1])
+        learned[1], learned[best] = learned[best], learned[1]
+        return learned, level[learned[1] >> 1]
+
+    def _bump(self, var):
+        self.activity[var] += self.var_inc
+        if self.activity[var] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.var_inc *= 1e-100
+            self._rebuild_heap()
+        else:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+            if len(self.heap) > 8 * self.num_vars + 1000:
+                self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self.heap = [(-self.activity[v], v) for v in range(1, self.num_vars + 1)
+                     if self.value[2 * v] == 0]
+        heapq.heapify(self.heap)
+
+    def _cancel_until(self, target):
+        if len(self.trail_lim) <= target:
+            return
+        start = self.trail_lim[target]
+        for lit in self.trail[start:]:
+            var = lit >> 1
+            self.value[lit] = 0
+            self.value[lit ^ 1] = 0
+            self.reason[var] = None
+            self.phase[var] = not lit & 1
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[target:]
+        self.qhead = len(self.trail)
+
+    def _pick_branch(self):
+        heap = self.heap
+        while heap:
+            activity, var = heapq.heappop(heap)
+            if self.value[2 * var] == 0 and -activity == self.activity[var]:
+                return 2 * var if self.phase[var] else 2 * var + 1
+        return None
+
+    def _reduce_learned(self):
+        # Drop the longer half of the learned clauses that are not locked as reasons
+        self.learned.sort(key=len)
+        keep = len(self.learned) // 2
+        kept = self.learned[:keep]
+        for clause in self.learned[keep:]:
+            var = clause[0] >> 1
+            if self.reason[var] is clause and self.value[clause[0]] == 1 or len(clause) <= 2:
+                kept.append(clause)
+            else:
+                clause.clear()
+        self.learned = kept
+        for lit in range(2, len(self.watches)):
+            self.watches[lit] = [c for c in self.watches[lit] if c]
+
+    def solve(self, max_conflicts=None):
+        """
+        Searches for a satisfying assignment.
+
+        Args:
+            max_conflicts (int): Give up after this many conflicts. Defaults to None (no limit).
+
+        Returns:
+            bool or None: True if satisfiable, False if unsatisfiable, None if the limit was hit
+                or stop asked to give up.
+        """
+        if not self.ok:
+            return False
+        self._cancel_until(0)
+        if self._propagate() is not None:
+            self.ok = False
+            return False
+
+        restarts = 0
+        budget = self.restart_base * luby(restarts + 1)
+        since_restart = 0
+        max_learned = max(len(self.clauses) // 3, 1000)
+
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, backjump = self._analyze(conflict)
+                self._cancel_until(backjump)
+                if len(learned) == 1:
+                    self._assign(learned[0], None)
+                elif len(learned) == 2:
+                    self._add_binary(learned)
+                    self._assign(learned[0], learned)
+                else:
+                    self.learned.append(learned)
+                    self._watch(learned)
+                    self._assign(learned[0], learned)
+                self.var_inc /= 0.95
+                if ((max_conflicts is not None and self.conflicts >= max_conflicts)
+                        or (self.stop is not None and not self.conflicts & 255 and self.stop())):
+                    self._cancel_until(0)
+                    return None
+                continue
+
+            if since_restart >= budget:
+                restarts += 1
+                since_restart = 0
+                budget = self.restart_base * luby(restarts + 1)
+                self._cancel_until(0)
+                if len(self.learned) >= max_learned:
+                    self._reduce_learned()
+                    max_learned = int(max_learned * 1.1)
+                continue
+
+            lit = self._pick_branch()
+            if lit is None:
+                return True
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self._assign(lit, None)
+
+    def model_value(self, var):
+        """Returns the value of var in the last satisfying assignment."""
+        return self.value[2 * var] == 1
+
+
+class SatFlowSolver:
+    """
+    Flow Free solver that encodes the puzzle as CNF and hands it to CDCLSolver.
+
+    Every cell gets exactly one color and every pair of neighboring cells an
+    edge variable; linked cells share their color. Endpoints have exactly
+    one edge, and every other cell picks one of the six path shapes, which
+    fixes its two edges. Closed loops that satisfy these local rules are
+    blocked one at a time and the formula is solved again.
+    """
+
+    def __init__(self, size, color_positions):
+        self.size = size
+        # Filter out colors with no detected positions
+        self.color_positions = {
+            color: positions for color, positions in color_positions.items() if positions
+        }
+        # Create empty grid
+        self.grid = [[None for _ in range(size)] for _ in range(size)]
+
+        self.endpoints = {}
+        for color, (start, end) in self.color_positions.items():
+            self.grid[start[0]][start[1]] = color
+            self.grid[end[0]][end[1]] = color
+            self.endpoints[tuple(start)] = color
+            self.endpoints[tuple(end)] = color
+
+        self.colors = list(self.color_positions)
+        self.sat = CDCLSolver()
+        self.color_vars = {}
+        self.edge_vars = {}
+        self.loops_blocked = 0
+
+    def _neighbor(self, x, y, direction):
+        dx, dy = DIRECTIONS[direction]
+        nx, ny = x + dx, y + dy
+        if 0 <= nx < self.size and 0 <= ny < self.size:
+            return nx, ny
+        return None
+
+    def _edge(self, a, b):
+        return self.edge_vars[(a, b) if a < b else (b, a)]
+
+    def _exactly_one(self, literals):
+        self.sat.add_clause(literals)
+        for i in range(len(literals)):
+            for j in range(i + 1, len(literals)):
+                self.sat.add_clause([-literals[i], -literals[j]])
+
+    def encode(self):
+        sat = self.sat
+        cells = [(x, y) for x in range(self.size) for y in range(self.size)]
+        for cell in cells:
+            self.color_vars[cell] = [sat.new_var() for _ in self.colors]
+            for d in (1, 3):
+                n = self._neighbor(*cell, d)
+                if n:
+                    self.edge_vars[(cell, n)] = sat.new_var()
+
+        for cell in cells:
+            self._exactly_one(self.color_vars[cell])
+            if cell in self.endpoints:
+                sat.add_clause([self.color_vars[cell][self.colors.index(self.endpoints[cell])]])
+
+        # No path closes on itself around a 2x2 block
+        for x in range(self.size - 1):
+            for y in range(self.size - 1):
+                square = [(x, y), (x, y + 1), (x + 1, y + 1), (x + 1, y)]
+                sat.add_clause([-self._edge(square[i], square[i - 1]) for i in range(4)])
+
+        # Linked cells share their color
+        for (a, b), e in self.edge_vars.items():
+            for ca, cb in zip(self.color_vars[a], self.color_vars[b]):
+                sat.add_clause([-e, -ca, cb])
+                sat.add_clause([-e, ca, -cb])
+
+        for cell in cells:
+            neighbors = [self._neighbor(*cell, d) for d in range(len(DIRECTIONS))]
+            edges = [self._edge(cell, n) if n else None for n in neighbors]
+
+            if cell in self.endpoints:
+                self._exactly_one([e for e in edges if e])
+                continue
+
+            types = [t for t in CELL_TYPES if edges[t[0]] and edges[t[1]]]
+            type_vars = [sat.new_var() for _ in types]
+            self._exactly_one(type_vars)
+            for cell_type, t in zip(types, type_vars):
+                for d, e in enumerate(edges):
+                    if e:
+                        sat.add_clause([-t, e] if d in cell_type else [-t, -e])
+            for d, e in enumerate(edges):
+                if e:
+                    sat.add_clause([-e] + [t for cell_type, t in zip(types, type_vars)
+                                           if d in cell_type])
+
+    def _decode(self):
+        for (x, y), colors in self.color_vars.items():
+            for k, var in enumerate(colors):
+                if self.sat.model_value(var):
+                    self.grid[x][y] = self.colors[k]
+
+    def _find_loops(self):
+        """Returns the edge variables of each closed loop in the current model."""
+        links = {}
+        for (a, b), e in self.edge_vars.items():
+            if self.sat.model_value(e):
+                links.setdefault(a, []).append(b)
+                links.setdefault(b, []).append(a)
+
+        reached = set()
+        for start in self.endpoints:
+            stack = [start]
+            while stack:
+                cur = stack.pop()
+                reached.add(cur)
+                stack.extend(n for n in links[cur] if n not in reached)
+
+        loops = []
+        for cell in links:
+            if cell in reached:
+                continue
+            loop = []
+            stack = [cell]
+            reached.add(cell)
+            while stack:
+                cur = stack.pop()
+                for n in links[cur]:
+                    if cur < n:
+                        loop.append(self._edge(cur, n))
+                    if n not in reached:
+                        reached.add(n)
+                        stack.append(n)
+            loops.append(loop)
+        return loops
+
+    def solve(self, max_conflicts=None):
+        """
+        Returns True and fills self.grid if solvable, False if not, or None if
+        max_conflicts was hit or self.sat.stop asked to give up.
+        """
+        if len(self.colors) == 0:
+            return False
+        if not self.color_vars:
+            self.encode()
+
+        while True:
+            result = self.sat.solve(max_conflicts)
+            if not result:
+                return result
+            self._decode()
+            loops = self._find_loops()
+            if not loops:
+                return True
+            for loop in loops:
+                self.sat.add_clause([-e for e in loop])
+                self.loops_blocked += 1
+
+    def print_grid(self):
+        for row in self.grid:
+            print(" ".join(cell[0].upper() if cell else '.' for cell in row))
+        print()
@@ -0,0 +1,170 @@
+import json
+import sqlite3
+import time
+
+# The 8 symmetries of a square board, mapping cell (x, y) on an n x n board
+SYMMETRIES = (
+    lambda n, x, y: (x, y),
+    lambda n, x, y: (y, n - 1 - x),
+    lambda n, x, y: (n - 1 - x, n - 1 - y),
+    lambda n, x, y: (n - 1 - y, x),
+    lambda n, x, y: (x, n - 1 - y),
+    lambda n, x, y: (n - 1 - x, y),
+    lambda n, x, y: (y, x),
+    lambda n, x, y: (n - 1 - y, n - 1 - x),
+)
+
+# Inserts between exact counts of the table, which pick up other processes' writes
+RECOUNT_INTERVAL = 256
+
+
+def canonical_form(size, color_positions):
+    """
+    Reduces a puzzle to a form shared by all its rotations, mirrors and color renamings.
+
+    Every color becomes its sorted pair of endpoints and the pairs are sorted,
+    which drops the color names. The smallest such list over the 8 board
+    symmetries is the canonical form.
+
+    Args:
+        size (int): Board width and height.
+        color_positions (dict): {'color': [(x, y), (x, y)]}.
+
+    Returns:
+        tuple: (key, symmetry, colors) where symmetry maps the caller's cells to
+            canonical ones and colors[i] is the caller's name for canonical color i,
+            or None if some color doesn't have exactly two endpoints.
+    """
+    colors = [color for color, positions in color_positions.items() if positions]
+    if any(len(color_positions[color]) != 2 for color in colors):
+        return None
+
+    best = None
+    for symmetry in SYMMETRIES:
+        pairs = sorted(
+            (tuple(sorted(symmetry(size, x, y) for x, y in color_positions[color])), color)
+            for color in colors
+        )
+        form = [pair for pair, _ in pairs]
+        if best is None or form < best[0]:
+            best = (form, symmetry, [color for _, color in pairs])
+
+    form, symmetry, names = best
+    key = json.dumps([size, form], separators=(',', ':'))
+    return key, symmetry, names
+
+
+class SolutionCache:
+    """
+    Persistent store of solved puzzles keyed by their canonical form.
+
+    Solutions are kept in a SQLite file in canonical orientation with colors
+    numbered, so one entry answers every rotated, mirrored or renamed copy of
+    a level. Puzzles proven unsolvable are remembered too. When the store
+    grows past max_entries the least recently used entries are dropped.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        """
+        Args:
+            path (str): SQLite database file, created if missing.
+            max_entries (int): Entries kept on disk.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, grid TEXT, last_used REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+        self.connection.commit()
+        # Running entry count, so put() needn't count the table on every insert
+        self.entries = len(self)
+        self.inserts = 0
+
+    def get(self, size, color_positions):
+        """
+        Looks up a puzzle.
+
+        Returns:
+            tuple: (solved, grid) with grid in the caller's orientation and color
+                names (None when unsolvable), or None on a miss.
+        """
+        form = canonical_form(size, color_positions)
+        if form is None:
+            return None
+        key, symmetry, names = form
+        row = self.connection.execute("SELECT grid FROM solutions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), key))
+
+        canonical = json.loads(row[0])
+        if canonical is None:
+            return False, None
+        grid = [[None] * size for _ in range(size)]
+        for x in range(size):
+            for y in range(size):
+                cx, cy = symmetry(size, x, y)
+                grid[x][y] = names[canonical[cx][cy]]
+        return True, grid
+
+    def put(self, size, color_positions, grid):
+        """
+        Stores a solved grid, or None for an unsolvable puzzle.
+        """
+        form = canonical_form(size, color_positions)
+        if form is None:
+            return
+        key, symmetry, names = form
+        canonical = None
+        if grid is not None:
+            numbers = {color: i for i, color in enumerate(names)}
+            canonical = [[None] * size for _ in range(size)]
+            for x in range(size):
+                for y in range(size):
+                    cx, cy = symmetry(size, x, y)
+                    canonical[cx][cy] = numbers[grid[x][y]]
+
+        with self.connection:
+            exists = self.connection.execute("SELECT 1 FROM solutions WHERE key = ?", (key,)).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions (key, grid, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(canonical, separators=(',', ':')), time.time()),
+            )
+            self.inserts += 1
+            if self.inserts % RECOUNT_INTERVAL == 0:
+                self.entries = len(self)
+            elif exists is None:
+                self.entries += 1
+            excess = self.entries - self.max_entries
+            if excess > 0:
+                deleted = self.connection.execute(
+                    "DELETE FROM solutions WHERE key IN "
+                    "(SELECT key FROM solutions ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self.entries -= deleted
+                self.evictions += deleted
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,186 @@
+import sys
+
+# Frontier labels: 0 is no edge, 1..C is a path piece that starts at an
+# endpoint of color label - 1, larger values pair up the two loose ends of a
+# piece that has no endpoint yet.
+
+
+def _normalize(downs, left, colors):
+    """Renumbers the loose-end pairs in order of appearance so equal states share a key."""
+    mapping = {}
+    next_label = colors + 1
+    out = []
+    for label in downs + (left,):
+        if label > colors:
+            if label not in mapping:
+                mapping[label] = next_label
+                next_label += 1
+            label = mapping[label]
+        out.append(label)
+    return tuple(out[:-1]), out[-1]
+
+
+def _replace(downs, left, old, new):
+    """Relabels the remaining end of piece old as new."""
+    if left == old:
+        return downs, new
+    i = downs.index(old)
+    return downs[:i] + (new,) + downs[i + 1:], left
+
+
+def _join(downs, left, a, b, colors):
+    """
+    Joins two loose ends inside the current cell.
+
+    Returns:
+        tuple: (downs, left), or None if the join is illegal.
+    """
+    if a <= colors and b <= colors:
+        # Two pieces of one color meet: that color's path is complete
+        return (downs, left) if a == b else None
+    if a == b:
+        # Both ends of one piece: a loop
+        return None
+    if a > colors and b > colors:
+        return _replace(downs, left, b, a)
+    color, piece = (a, b) if a <= colors else (b, a)
+    return _replace(downs, left, piece, color)
+
+
+def count_solutions(size, color_positions, limit=None):
+    """
+    Counts the solutions of a puzzle with a frontier dynamic program.
+
+    Cells are swept row by row. The state is the set of edges crossing the
+    sweep line, labelled by which path piece they belong to. Only which
+    loose ends are connected and which color they carry matters for the
+    rest of the board, so equal states are merged and their counts added.
+    The number of states depends on the board width, not on how many
+    solutions there are.
+
+    A solution is a set of links between neighbouring cells, with every
+    cell covered and every pair of endpoints joined by one path. Two link
+    sets that colour the board the same way count separately.
+
+    Args:
+        size (int): Board width and height.
+        color_positions (dict): {'color': [(x, y), (x, y)]}.
+        limit (int): Stop counting at this many. Defaults to None (exact count).
+            limit=2 answers "none, unique or several" most cheaply.
+
+    Returns:
+        tuple: (count, stats) with stats holding the frontier width, peak
+            number of states and their approximate memory in bytes.
+    """
+    colors = [color for color, positions in color_positions.items() if positions]
+    endpoint = {}
+    for label, color in enumerate(colors, start=1):
+        positions = color_positions[color]
+        if len(positions) != 2:
+            raise ValueError(f"Color {color!r} needs exactly two endpoints, got {len(positions)}")
+        for x, y in positions:
+            endpoint[(x, y)] = label
+    num_colors = len(colors)
+
+    states = {((0,) * size, 0): 1}
+    peak_states = 1
+    peak_bytes = sys.getsizeof(states)
+    states_per_row = []
+
+    for x in range(size):
+        for y in range(size):
+            can_right = y < size - 1
+            can_down = x < size - 1
+            cell_color = endpoint.get((x, y))
+            fresh = num_colors + 2 * size + 2  # above any label in use
+            new_states = {}
+
+            def add(downs, left, count):
+                key = _normalize(downs, left, num_colors)
+                total = new_states.get(key, 0) + count
+                new_states[key] = total if limit is None else min(total, limit)
+
+            for (downs, left), count in states.items():
+                up = downs[y]
+                cleared = downs[:y] + (0,) + downs[y + 1:]
+                incoming = [label for label in (up, left) if label]
+
+                if cell_color is not None:
+                    # Endpoints have exactly one link
+                    if len(incoming) == 1:
+                        label = incoming[0]
+                        if label <= num_colors:
+                            if label == cell_color:
+                                add(cleared, 0, count)
+                        else:
+                            add(*_replace(cleared, 0, label, cell_color), count)
+                    elif not incoming:
+                        if can_right:
+                            add(cleared, cell_color, count)
+                        if can_down:
+                            add(cleared[:y] + (cell_color,) + cleared[y + 1:], 0, count)
+                    continue
+
+                # Every other cell is passed through by exactly one path
+                if len(incoming) == 2:
+                    joined = _join(cleared, 0, up, left, num_colors)
+                    if joined is not None:
+                        add(*joined, count)
+                elif len(incoming) == 1:
+                    label = incoming[0]
+                    if can_right:
+                        add(cleared, label, count)
+                    if can_down:
+                        add(cleared[:y] + (label,) + cleared[y + 1:], 0, count)
+                elif can_right and can_down:
+                    add(cleared[:y] + (fresh,) + cleared[y + 1:], fresh, count)
+
+            states = new_states
+            if len(states) > peak_states:
+                peak_states = len(states)
+                key = next(iter(states))
+                peak_bytes = sys.getsizeof(states) + len(states) * (
+                    sys.getsizeof(key) + sys.getsizeof(key[0]) + 28)
+            if not states:
+                break
+        states_per_row.append(len(states))
+        if not states:
+            break
+
+    count = states.get(((0,) * size, 0), 0)
+    return count, {
+        'width': size,
+        'peak_states': peak_states,
+        'peak_bytes': peak_bytes,
+        'states_per_row': states_per_row,
+    }
+
+
+def uniqueness(size, color_positions):
+    """Returns 0 if the puzzle has no solution, 1 if it has exactly one and 2 if it has more."""
+    return count_solutions(size, color_positions, limit=2)[0]
+
+
+def memory_report(puzzles):
+    """
+    Prints and returns the frontier memory for each board width.
+
+    Args:
+        puzzles (iterable): (size, color_positions) pairs.
+
+    Returns:
+        dict: {width: {'puzzles', 'peak_states', 'peak_bytes'}}, the peaks over puzzles of that width.
+    """
+    report = {}
+    for size, color_positions in puzzles:
+        _, stats = count_solutions(size, color_positions, limit=2)
+        row = report.setdefault(size, {'puzzles': 0, 'peak_states': 0, 'peak_bytes': 0})
+        row['puzzles'] += 1
+        row['peak_states'] = max(row['peak_states'], stats['peak_states'])
+        row['peak_bytes'] = max(row['peak_bytes'], stats['peak_bytes'])
+
+    print(f"{'width':>6}{'puzzles':>9}{'states':>10}{'memory':>12}")
+    for width in sorted(report):
+        row = report[width]
+        print(f"{width:>6}{row['puzzles']:>9}{row['peak_states']:>10}{row['peak_bytes'] / 1024:>10.0f}KB")
+    return report
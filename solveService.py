@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from warmWorker import WarmWorker
+
+# Largest request body accepted, in bytes
+MAX_BODY = 32 << 20
+
+# Job keys a client may set; anything else in the request is ignored
+JOB_KEYS = ('image', 'size', 'color_positions', 'node_limit', 'ordering', 'backend')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 422: 'Unprocessable Entity', 504: 'Gateway Timeout'}
+
+# The WarmWorker of this pool process
+_worker = None
+
+
+def _init_worker():
+    global _worker
+    _worker = WarmWorker()
+
+
+def _run(job):
+    deadline = job.get('deadline')
+    if deadline is not None and time.monotonic() >= deadline:
+        # Everyone waiting on this job has already been told it timed out
+        return {'error': "deadline passed while queued"}
+    return _worker.handle(job)
+
+
+def _ready():
+    return True
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list, None if it is empty."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class SolveService:
+    """
+    HTTP front end that detects and solves puzzles in a pool of warm worker processes.
+
+    POST /solve takes either JSON, {'image': path} or {'size': n,
+    'color_positions': {...}}, or the raw bytes of a screenshot. A
+    'timeout' in the JSON or the query string sets the request's deadline.
+    Requests for the same puzzle that arrive while it is being solved
+    share that one solve. GET /metrics reports queue depth and latency
+    percentiles and GET /health answers once the workers are up.
+    """
+
+    def __init__(self, workers=None, timeout=10.0, latency_window=1000):
+        """
+        Args:
+            workers (int): Worker processes. Defaults to the number of CPUs.
+            timeout (float): Deadline, in seconds, for requests that don't set one.
+            latency_window (int): Latest requests the latency percentiles are taken over.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        # spawn, not fork: the event loop and the pool's own threads shouldn't be copied
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        # Solves in progress by job key, for coalescing
+        self.in_flight = {}
+        self.waiting = 0
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.counts = {'requests': 0, 'solves': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0}
+        self.started = time.monotonic()
+
+    async def warm_up(self):
+        """Starts every worker process and waits until each has loaded OpenCV and the solver."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _ready) for _ in range(self.workers)))
+
+    @staticmethod
+    def job_key(job):
+        """Returns a key equal for jobs that would give the same answer."""
+        options = [job.get(key) for key in ('node_limit', 'ordering', 'backend')]
+        if 'image_data' in job:
+            return 'data', hashlib.sha256(job['image_data']).hexdigest(), json.dumps(options)
+        if 'image' in job:
+            # A rewritten file is a new job
+            stat = os.stat(job['image'])
+            return 'image', os.path.abspath(job['image']), stat.st_mtime_ns, stat.st_size, json.dumps(options)
+        positions = sorted((color, sorted(tuple(p) for p in cells)) for color, cells in job['color_positions'].items())
+        return 'board', json.dumps([job['size'], positions, options])
+
+    @staticmethod
+    def check_job(job):
+        """Returns what is wrong with a JSON job's shape, or None if it can be keyed and solved."""
+        if 'image' in job:
+            if not isinstance(job['image'], str):
+                return "'image' must be a path string"
+            return None
+        size = job['size']
+        if not isinstance(size, int) or isinstance(size, bool) or size < 1:
+            return "'size' must be a positive integer"
+        color_positions = job['color_positions']
+        if not isinstance(color_positions, dict):
+            return "'color_positions' must be an object of color: [[x, y], [x, y]]"
+        for color, cells in color_positions.items():
+            if not (isinstance(cells, list) and len(cells) == 2 and
+                    all(isinstance(cell, list) and len(cell) == 2 and
+                        all(isinstance(v, int) and not isinstance(v, bool) for v in cell) for cell in cells)):
+                return f"'color_positions' entry {color!r} must be two [x, y] integer points"
+        return None
+
+    async def solve(self, job, timeout):
+        """
+        Runs a job in the pool, or joins the identical one already running.
+
+        A joined solve keeps the budget of the request that started it; each
+        caller still stops waiting at its own deadline.
+
+        Raises:
+            asyncio.TimeoutError: If the job isn't done within timeout seconds.
+        """
+        key = self.job_key(job)
+        future = self.in_flight.get(key)
+        if future is None:
+            job = dict(job, deadline=time.monotonic() + timeout)
+            future = asyncio.get_running_loop().run_in_executor(self.pool, _run, job)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.counts['solves'] += 1
+        else:
+            self.counts['coalesced'] += 1
+
+        self.waiting += 1
+        try:
+            # shield: one caller giving up mustn't cancel the solve for the others
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        finally:
+            self.waiting -= 1
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        return dict(
+            self.counts,
+            uptime_s=time.monotonic() - self.started,
+            workers=self.workers,
+            in_flight=len(self.in_flight),
+            queue_depth=max(0, len(self.in_flight) - self.workers),
+            waiting=self.waiting,
+            latency_ms={
+                'samples': len(latencies),
+                'p50': percentile(latencies, 0.50),
+                'p90': percentile(latencies, 0.90),
+                'p99': percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else None,
+            },
+        )
+
+    async def handle_solve(self, query, headers, body):
+        start = time.monotonic()
+        self.counts['requests'] += 1
+        try:
+            status, payload = await self._solve_request(query, headers, body)
+        finally:
+            self.latencies.append(round((time.monotonic() - start) * 1000, 2))
+        if status != 200:
+            self.counts['errors' if status != 504 else 'timeouts'] += 1
+        return status, payload
+
+    async def _solve_request(self, query, headers, body):
+        timeout = query.get('timeout', [None])[0]
+        if headers.get('content-type', '').startswith('application/json') or body[:1] == b'{':
+            try:
+                request = json.loads(body)
+            except ValueError as e:
+                return 400, {'error': f"bad JSON: {e}"}
+            if not isinstance(request, dict):
+                return 400, {'error': "expected a JSON object"}
+            job = {key: request[key] for key in JOB_KEYS if key in request}
+            if 'image' not in job and not ('size' in job and 'color_positions' in job):
+                return 400, {'error': "send 'image', or 'size' and 'color_positions'"}
+            problem = self.check_job(job)
+            if problem:
+                return 400, {'error': problem}
+            timeout = request.get('timeout', timeout)
+        elif body:
+            job = {'image_data': body}
+        else:
+            return 400, {'error': "empty request"}
+
+        try:
+            timeout = self.timeout if timeout is None else float(timeout)
+            if timeout <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            return 400, {'error': f"bad timeout {timeout!r}"}
+
+        try:
+            result = await self.solve(job, timeout)
+        except asyncio.TimeoutError:
+            return 504, {'error': f"no answer within {timeout}s"}
+        except OSError as e:
+            return 400, {'error': str(e)}
+        return (422 if 'error' in result else 200), result
+
+    async def route(self, method, target, headers, body):
+        url = urlsplit(target)
+        if url.path == '/solve':
+            if method != 'POST':
+                return 405, {'error': "use POST"}
+            return await self.handle_solve(parse_qs(url.query), headers, body)
+        if url.path == '/metrics':
+            return 200, self.metrics()
+        if url.path == '/health':
+            return 200, {'ok': True}
+        return 404, {'error': f"no such endpoint {url.path}"}
+
+    async def handle_connection(self, reader, writer):
+        """Serves HTTP/1.1 requests on one connection, keeping it open between them."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "bad request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= MAX_BODY:
+                    await self._respond(writer, 413 if length > 0 else 400, {'error': "bad Content-Length"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload = await self.route(method, target, headers, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix=None):
+        """Warms the pool up and serves until cancelled."""
+        await self.warm_up()
+        if unix:
+            if os.path.exists(unix):
+                os.unlink(unix)
+            server = await asyncio.start_unix_server(self.handle_connection, unix)
+            where = unix
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            where = f"http://{host}:{port}"
+        print(f"Solve service listening on {where} with {self.workers} workers", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            if unix and os.path.exists(unix):
+                os.unlink(unix)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Flow Free detection and solving over local HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timeout', type=float, default=10.0, help="Default per-request deadline in seconds")
+    args = parser.parse_args(argv)
+
+    service = SolveService(workers=args.workers, timeout=args.timeout)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
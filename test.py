@@ -1,50 +1,442 @@
-import cv2
-import numpy as np
-import matplotlib.colors as mc
+import colorsys
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict, namedtuple
+
+# cv2 and numpy are imported where they are used, so building a detector or
+# answering from the DetectionCache doesn't pay for loading them
+
+# Board position in pixels plus its number of rows and columns
+GridGeometry = namedtuple('GridGeometry', ['x', 'y', 'width', 'height', 'rows', 'cols'])
+
+
+def square_size(geometry):
+    """
+    Returns the side of a detected board, the size FlowFreeSolver takes.
+
+    Raises:
+        ValueError: If the board isn't square; the solver only handles N x N boards.
+    """
+    if geometry.rows != geometry.cols:
+        raise ValueError(f"Detected a {geometry.rows}x{geometry.cols} board, but only square boards can be solved")
+    return geometry.rows
+
+# cv2.imdecode flags for decoding at 1/1, 1/2, 1/4 and 1/8 of the full resolution
+REDUCED_DECODE_FLAGS = {
+    1: 'IMREAD_COLOR',
+    2: 'IMREAD_REDUCED_COLOR_2',
+    4: 'IMREAD_REDUCED_COLOR_4',
+    8: 'IMREAD_REDUCED_COLOR_8',
+}
+
+# Default HSV ranges (OpenCV scale: H 0-179, S 0-255, V 0-255). Blue and green
+# are #1028ff and #008d00, i.e. HSV (116, 239, 255) and (59, 255, 141), with a
+# tolerance of 5 on hue and 30 on saturation and value.
+DEFAULT_COLOR_RANGES = {
+    'red':    [((0, 100, 100), (10, 255, 255)), ((170, 100, 100), (180, 255, 255))],
+    'green':  [((54, 225, 111), (64, 255, 171))],
+    'blue':   [((111, 209, 225), (121, 255, 255))],
+    'yellow': [((20, 100, 100), (40, 255, 255))],
+    'orange': [((10, 100, 100), (25, 255, 255))],
+}
+
+
+class DetectionCache:
+    """
+    Detection results keyed by image content hash, kept in an LRU and optionally on disk.
+
+    The on-disk store holds one small JSON file per entry, so it can be shared
+    by several processes and survives between runs.
+    """
+
+    def __init__(self, max_entries=256, directory=None):
+        """
+        Args:
+            max_entries (int): Entries kept in memory. 0 keeps none.
+            directory (str): Directory for the persistent store. Defaults to None (memory only).
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Returns (color_positions, color_coords, geometry) for key, or None."""
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+        if self.directory:
+            try:
+                with open(self._path(key)) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = None
+            if stored is not None:
+                result = (
+                    {color: [tuple(p) for p in cells] for color, cells in stored['positions'].items()},
+                    {color: [tuple(p) for p in points] for color, points in stored['coords'].items()},
+                    GridGeometry(*stored['geometry']),
+                )
+                self._remember(key, result)
+                self.disk_hits += 1
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """Stores a detection result under key."""
+        self._remember(key, result)
+        if self.directory:
+            positions, coords, geometry = result
+            # Write then rename, so concurrent readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'positions': positions, 'coords': coords, 'geometry': list(geometry)}, f)
+            os.replace(tmp, self._path(key))
+
+    def _remember(self, key, result):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns hit and miss counters."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
 
 class ColorGridDetector:
-    def __init__(self, grid_size=(5, 5), color_ranges=None, min_blob_area=50, aspect_ratio_threshold=0.8):
+    # Label lookup tables shared by detectors with the same color ranges
+    _lut_cache = {}
+
+    def __init__(self, grid_size=None, color_ranges=None, min_blob_area=50, aspect_ratio_threshold=0.8,
+                 cache=None, max_reduction=2, min_cell_pixels=40):
         """
         Initializes the ColorGridDetector.
 
         Args:
-            grid_size (tuple): (rows, cols) of the grid. Defaults to (5, 5).
+            grid_size (tuple): (rows, cols) of the grid, treating the whole image as the board.
+                Defaults to None, which locates the board and its size in every image.
             color_ranges (dict): {'color': [(lower_hsv, upper_hsv), ...]}. Defaults to None.
             min_blob_area (int): Minimum area (in pixels) for a detected color blob. Defaults to 50.
             aspect_ratio_threshold (float): Minimum aspect ratio to consider a blob circle-like. Defaults to 0.8.
+            cache (DetectionCache): Results cache shared between calls. Defaults to None, a private in-memory cache.
+            max_reduction (int): Largest decode reduction to try, 1, 2, 4 or 8. Defaults to 2.
+            min_cell_pixels (int): Smallest cell side, in decoded pixels, a reduced decode may give. Defaults to 40.
         """
+        if max_reduction not in REDUCED_DECODE_FLAGS:
+            raise ValueError(f"max_reduction must be one of {sorted(REDUCED_DECODE_FLAGS)}")
         self.grid_size = grid_size
         self.color_ranges = color_ranges if color_ranges else self._default_color_ranges()
         self.min_blob_area = min_blob_area
         self.aspect_ratio_threshold = aspect_ratio_threshold
+        self.cache = cache if cache is not None else DetectionCache(max_entries=32)
+        self.max_reduction = max_reduction
+        self.min_cell_pixels = min_cell_pixels
+        # Geometry of the last detected board, see locate_grid
+        self.geometry = None
 
     def _default_color_ranges(self):
         """Returns default HSV color ranges."""
-        blue_hex = "#1028ff"
-        green_hex = "#008d00"
-
-        blue_hsv = self._hex_to_hsv(blue_hex)
-        green_hsv = self._hex_to_hsv(green_hex)
-
-        tolerance_h = 5
-        tolerance_sv = 30
-
-        return {
-            'red':   [((0, 100, 100), (10, 255, 255)), ((170, 100, 100), (180, 255, 255))],
-            'green': [((max(0, green_hsv[0] - tolerance_h), max(0, green_hsv[1] - tolerance_sv), max(0, green_hsv[2] - tolerance_sv)),
-                       (min(179, green_hsv[0] + tolerance_h), min(255, green_hsv[1] + tolerance_sv), min(255, green_hsv[2] + tolerance_sv)))],
-            'blue':  [((max(0, blue_hsv[0] - tolerance_h), max(0, blue_hsv[1] - tolerance_sv), max(0, blue_hsv[2] - tolerance_sv)),
-                       (min(179, blue_hsv[0] + tolerance_h), min(255, blue_hsv[1] + tolerance_sv), min(255, blue_hsv[2] + tolerance_sv)))],
-            'yellow': [((20, 100, 100), (40, 255, 255))],
-            'orange': [((10, 100, 100), (25, 255, 255))]
-        }
+        return {color: list(ranges) for color, ranges in DEFAULT_COLOR_RANGES.items()}
 
     def _hex_to_hsv(self, hex_color):
         """Converts a hex color code to HSV (OpenCV scale: H 0-179, S 0-255, V 0-255)."""
-        rgb = mc.to_rgb(hex_color)
-        hsv_float = mc.rgb_to_hsv(rgb)
+        hex_color = hex_color.lstrip('#')
+        rgb = [int(hex_color[i:i + 2], 16) / 255 for i in (0, 2, 4)]
+        hsv_float = colorsys.rgb_to_hsv(*rgb)
         return (int(hsv_float[0] * 179), int(hsv_float[1] * 255), int(hsv_float[2] * 255))
 
+    def _label_lut(self):
+        """
+        Returns a (180, 256, 256) uint8 table mapping an HSV pixel to a color label.
+
+        Label 0 is background and label i is the i-th color of self.color_ranges.
+        Where ranges of different colors overlap, the color whose hue range is
+        centred closest to the pixel wins. Tables are cached per set of ranges.
+        """
+        import numpy as np
+
+        key = tuple((color, tuple(tuple(map(tuple, r)) for r in ranges))
+                    for color, ranges in self.color_ranges.items())
+        lut = ColorGridDetector._lut_cache.get(key)
+        if lut is not None:
+            return lut
+
+        lut = np.zeros((180, 256, 256), dtype=np.uint8)
+        distance = np.full((180, 256, 256), 255, dtype=np.uint8)
+        for label, ranges in enumerate(self.color_ranges.values(), start=1):
+            for lower, upper in ranges:
+                h0, s0, v0 = lower
+                h1, s1, v1 = (min(upper[0], 179), upper[1], upper[2])
+                hues = np.arange(h0, h1 + 1)
+                hue_distance = np.abs(2 * hues - (h0 + h1)).astype(np.uint8)[:, None, None]
+                box = (slice(h0, h1 + 1), slice(s0, s1 + 1), slice(v0, v1 + 1))
+                closer = hue_distance < distance[box]
+                lut[box][closer] = label
+                distance[box][closer] = np.broadcast_to(hue_distance, closer.shape)[closer]
+        ColorGridDetector._lut_cache[key] = lut
+        return lut
+
+    def detect_image(self, img, scale=1):
+        """
+        Detects colored circles in an already decoded image in a single pass.
+
+        Every pixel is labelled with one lookup in the HSV table and all blobs of
+        all colors come out of one connected-components call, so the cost does
+        not grow with the number of colors.
+
+        Args:
+            img (numpy.ndarray): BGR image.
+            scale (int): How many times smaller img is than the original screenshot.
+                Blob areas are compared at that scale and coordinates are scaled back up.
+
+        Returns:
+            tuple: ({'color': [(row, col), ...]}, {'color': [(x, y), ...]}) grid cells and pixel centroids.
+        """
+        import cv2
+        import numpy as np
+
+        colors = list(self.color_ranges)
+        color_positions = {color: [] for color in colors}
+        color_coords = {color: [] for color in colors}
+
+        geometry = self._geometry(img)
+        self.geometry = geometry
+        # Only the board itself is scanned
+        board = img[geometry.y:geometry.y + geometry.height, geometry.x:geometry.x + geometry.width]
+
+        hsv = cv2.cvtColor(board, cv2.COLOR_BGR2HSV)
+        index = (hsv[..., 0].astype(np.int32) << 16) | (hsv[..., 1].astype(np.int32) << 8) | hsv[..., 2]
+        labels = np.take(self._label_lut().ravel(), index)
+
+        # Cut touching blobs of different colors apart before labelling components
+        foreground = labels > 0
+        border = np.zeros_like(foreground)
+        border[:, :-1] |= (labels[:, :-1] != labels[:, 1:]) & foreground[:, 1:]
+        border[:-1, :] |= (labels[:-1, :] != labels[1:, :]) & foreground[1:, :]
+        mask = (foreground & ~border).astype(np.uint8)
+
+        count, components, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=4)
+        component_labels = np.zeros(count, dtype=np.uint8)
+        component_labels[components[foreground]] = labels[foreground]
+
+        rows, cols = geometry.rows, geometry.cols
+        min_blob_area = self.min_blob_area / (scale * scale)
+        cell_height = geometry.height // rows
+        cell_width = geometry.width // cols
+
+        # Walk components bottom-up, the order findContours reports them in
+        for i in range(count - 1, 0, -1):
+            x, y, w, h, area = stats[i]
+            if area <= min_blob_area or h == 0:
+                continue
+            aspect_ratio = float(w) / h
+            if not (self.aspect_ratio_threshold < aspect_ratio < 1 / self.aspect_ratio_threshold):
+                continue
+            # It's somewhat circle-like, use its centroid
+            color = colors[component_labels[i] - 1]
+            cX, cY = int(centroids[i][0]), int(centroids[i][1])
+            color_coords[color].append(((cX + geometry.x) * scale, (cY + geometry.y) * scale))
+            row = cY // cell_height
+            col = cX // cell_width
+            if 0 <= row < rows and 0 <= col < cols:
+                color_positions[color].append((row, col))
+
+        if scale != 1:
+            self.geometry = GridGeometry(geometry.x * scale, geometry.y * scale, geometry.width * scale,
+                                         geometry.height * scale, rows, cols)
+        return color_positions, color_coords
+
+    def _geometry(self, img):
+        height, width = img.shape[:2]
+        if self.grid_size is not None:
+            return GridGeometry(0, 0, width, height, *self.grid_size)
+        geometry = self.locate_grid(img)
+        if geometry is None:
+            print("Warning: Could not find the board grid lines, assuming a 5x5 board filling the image")
+            return GridGeometry(0, 0, width, height, 5, 5)
+        return geometry
+
+    @staticmethod
+    def _line_centers(profile):
+        """Returns the centres of the runs where profile is above half its maximum."""
+        import numpy as np
+
+        above = (profile > profile.max() / 2).astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], above, [0]))))
+        return (edges[::2] + edges[1::2] - 1) / 2.0
+
+    @staticmethod
+    def _regular_lines(centers, min_pitch=8):
+        """Returns the longest evenly spaced run of line centres."""
+        import numpy as np
+
+        best = []
+        for i in range(len(centers)):
+            for j in range(i + 1, len(centers)):
+                pitch = centers[j] - centers[i]
+                if pitch < min_pitch:
+                    continue
+                lines = [centers[i], centers[j]]
+                while True:
+                    expected = lines[-1] + pitch
+                    k = np.argmin(np.abs(centers - expected))
+                    if abs(centers[k] - expected) > max(2, 0.05 * pitch):
+                        break
+                    lines.append(centers[k])
+                if (len(lines), lines[-1] - lines[0]) > (len(best), best[-1] - best[0] if best else 0):
+                    best = lines
+        return best
+
+    def locate_grid(self, img, ridge_offset=3, ridge_threshold=20, step=4):
+        """
+        Finds the board and its grid size from grid-line projection profiles.
+
+        A pixel belongs to a horizontal grid line when it is brighter than the
+        pixels ridge_offset rows above and below it, and to a vertical line
+        likewise across columns. Summing those masks along rows and columns
+        gives profiles that peak on the grid lines. The longest evenly spaced
+        run of peaks gives the board edges and the cell pitch. Profiles are
+        sampled every step pixels along the line direction.
+
+        Args:
+            img (numpy.ndarray): BGR image.
+
+        Returns:
+            GridGeometry: Board position and size, or None if no grid was found.
+        """
+        import cv2
+        import numpy as np
+
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        r = ridge_offset
+        # Pad with background so lines on the image border still count as ridges
+        gray = cv2.copyMakeBorder(gray, r, r, r, r, cv2.BORDER_CONSTANT, value=0)
+
+        sampled = gray[:, ::step].astype(np.int16)
+        horizontal = (sampled[r:-r] - np.maximum(sampled[:-2 * r], sampled[2 * r:])) > ridge_threshold
+        sampled = gray[::step, :].astype(np.int16)
+        vertical = (sampled[:, r:-r] - np.maximum(sampled[:, :-2 * r], sampled[:, 2 * r:])) > ridge_threshold
+
+        row_lines = self._regular_lines(self._line_centers(horizontal.sum(axis=1)))
+        col_lines = self._regular_lines(self._line_centers(vertical.sum(axis=0)))
+        if len(row_lines) < 2 or len(col_lines) < 2:
+            return None
+
+        y, x = int(round(row_lines[0])), int(round(col_lines[0]))
+        return GridGeometry(x, y, int(round(col_lines[-1])) - x, int(round(row_lines[-1])) - y,
+                            len(row_lines) - 1, len(col_lines) - 1)
+
+    def cache_key(self, data):
+        """Returns the cache key for encoded image bytes under this detector's settings."""
+        config = json.dumps([self.grid_size, sorted(self.color_ranges.items()), self.min_blob_area,
+                             self.aspect_ratio_threshold, self.max_reduction, self.min_cell_pixels])
+        digest = hashlib.sha256(data)
+        digest.update(config.encode())
+        return digest.hexdigest()
+
+    def detect(self, image_path):
+        """
+        Reads an image once and returns both grid cells and pixel centroids.
+
+        Results are cached by file content, so an unchanged image is neither
+        decoded nor scanned again. The image is first decoded at up to
+        1/max_reduction of its resolution; if the board's cells come out
+        smaller than min_cell_pixels it is decoded again at full size.
+
+        Args:
+            image_path (str): Path to the image.
+
+        Returns:
+            tuple: ({'color': [(row, col), ...]}, {'color': [(x, y), ...]}), or ({}, {}) if the image can't be read.
+        """
+        self.geometry = None
+        try:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = b''
+
+        key = self.cache_key(data)
+        cached = self.cache.get(key)
+        if cached is not None:
+            positions, coords, self.geometry = cached
+            return positions, coords
+
+        import cv2
+        import numpy as np
+
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        scale = self.max_reduction
+        while True:
+            img = cv2.imdecode(buffer, getattr(cv2, REDUCED_DECODE_FLAGS[scale])) if data else None
+            if img is None:
+                print(f"Error: Could not open or find the image at {image_path}")
+                return {}, {}
+            positions, coords = self.detect_image(img, scale)
+            geometry = self.geometry
+            cell = min(geometry.width // geometry.cols, geometry.height // geometry.rows) // scale
+            if scale == 1 or cell >= self.min_cell_pixels:
+                break
+            # Dots would be too small at this reduction, fall back to full resolution
+            scale = 1
+
+        self.cache.put(key, (positions, coords, geometry))
+        return positions, coords
+
+    def detect_frame(self, frame):
+        """
+        Detects a board in an already decoded BGR frame, such as one from a video.
+
+        Like detect, the frame is first scanned shrunk by up to max_reduction and
+        again at full size if the cells come out smaller than min_cell_pixels.
+        Frames aren't cached; callers decide which ones are worth a look.
+
+        Args:
+            frame (numpy.ndarray): BGR image.
+
+        Returns:
+            tuple: ({'color': [(row, col), ...]}, {'color': [(x, y), ...]}).
+        """
+        import cv2
+
+        scale = self.max_reduction
+        while True:
+            img = frame
+            if scale != 1:
+                img = cv2.resize(frame, (frame.shape[1] // scale, frame.shape[0] // scale),
+                                 interpolation=cv2.INTER_AREA)
+            positions, coords = self.detect_image(img, scale)
+            geometry = self.geometry
+            cell = min(geometry.width // geometry.cols, geometry.height // geometry.rows) // scale
+            if scale == 1 or cell >= self.min_cell_pixels:
+                return positions, coords
+            scale = 1
+
     def detect_colors(self, image_path):
         """
         Detects colored circles in a grid image.
@@ -55,42 +447,7 @@ class ColorGridDetector:
         Returns:
             dict: {'color': [(row, col), ...]}
         """
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Error: Could not open or find the image at {image_path}")
-            return {}
-
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        color_positions = {color: [] for color in self.color_ranges}
-        height, width, _ = img.shape
-        rows, cols = self.grid_size
-        cell_height = height // rows
-        cell_width = width // cols
-
-        for color, ranges in self.color_ranges.items():
-            for lower_hsv, upper_hsv in ranges:
-                lower_bound = np.array(lower_hsv, dtype=np.uint8)
-                upper_bound = np.array(upper_hsv, dtype=np.uint8)
-                mask = cv2.inRange(hsv, lower_bound, upper_bound)
-                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-                for contour in contours:
-                    area = cv2.contourArea(contour)
-                    if area > self.min_blob_area:
-                        x, y, w, h = cv2.boundingRect(contour)
-                        aspect_ratio = float(w) / h if h > 0 else 0
-                        if aspect_ratio > self.aspect_ratio_threshold and aspect_ratio < (1 / self.aspect_ratio_threshold):
-                            # It's somewhat circle-like, calculate centroid
-                            M = cv2.moments(contour)
-                            if M["m00"] != 0:
-                                cX = int(M["m10"] / M["m00"])
-                                cY = int(M["m01"] / M["m00"])
-                                row = cY // cell_height
-                                col = cX // cell_width
-                                if 0 <= row < rows and 0 <= col < cols:
-                                    color_positions[color].append((row, col))
-
-        return color_positions
+        return self.detect(image_path)[0]
 
     def detect_unscaled_colors(self, image_path):
         """
@@ -102,36 +459,7 @@ class ColorGridDetector:
         Returns:
             dict: {'color': [(x, y), ...]} — pixel coordinates of each detected colored blob.
         """
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"Error: Could not open or find the image at {image_path}")
-            return {}
-
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        color_coords = {color: [] for color in self.color_ranges}
-
-        for color, ranges in self.color_ranges.items():
-            for lower_hsv, upper_hsv in ranges:
-                lower_bound = np.array(lower_hsv, dtype=np.uint8)
-                upper_bound = np.array(upper_hsv, dtype=np.uint8)
-                mask = cv2.inRange(hsv, lower_bound, upper_bound)
-                contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-                for contour in contours:
-                    area = cv2.contourArea(contour)
-                    if area > self.min_blob_area:
-                        x, y, w, h = cv2.boundingRect(contour)
-                        aspect_ratio = float(w) / h if h > 0 else 0
-                        if aspect_ratio > self.aspect_ratio_threshold and aspect_ratio < (1 / self.aspect_ratio_threshold):
-                            # Compute centroid (unscaled)
-                            M = cv2.moments(contour)
-                            if M["m00"] != 0:
-                                cX = int(M["m10"] / M["m00"])
-                                cY = int(M["m01"] / M["m00"])
-                                color_coords[color].append((cX, cY))
-
-        return color_coords
-    
+        return self.detect(image_path)[1]
 
 
 if __name__ == "__main__":
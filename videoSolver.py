@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Side of the shrunken frame a board hash is taken from; the hash has HASH_SIZE ** 2 bits
+HASH_SIZE = 16
+
+
+def board_hash(frame, size=HASH_SIZE):
+    """
+    Returns a difference hash of a frame.
+
+    The frame is shrunk to size x (size + 1) grey pixels and every pixel
+    contributes one bit: whether it is brighter than its right neighbour.
+    Compression noise and small shifts barely change it, a new board does.
+
+    Args:
+        frame (numpy.ndarray): BGR image.
+        size (int): Hash side in pixels.
+
+    Returns:
+        bytes: size * size bits.
+    """
+    import cv2
+    import numpy as np
+
+    # Shrink first so the colour conversion only touches a few hundred pixels
+    small = cv2.resize(frame, (size + 1, size), interpolation=cv2.INTER_AREA)
+    grey = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return np.packbits(grey[:, 1:] > grey[:, :-1]).tobytes()
+
+
+def hash_distance(a, b):
+    """Number of bits two board hashes differ in."""
+    return bin(int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).count('1')
+
+
+def process_video(path, output, render_dir=None, sample_fps=5.0, threshold=12, settle=2,
+                  timeout=2.0, detector=None):
+    """
+    Solves every level that appears in a screen recording.
+
+    Frames are read in order and about sample_fps of them per second are
+    hashed; the rest are only grabbed. Once a frame has matched the one
+    before it for settle samples and differs from the last frame looked at,
+    the board is detected. A finished color's dots merge into its path and
+    drop out of the detection, so a board of the current level's size
+    whose dots are all among the current level's is that level being
+    played and is skipped. Any other complete board is a new level and
+    gets solved.
+
+    Args:
+        path (str): Video file, anything cv2.VideoCapture reads.
+        output (file): Where one JSON record per level is written.
+        render_dir (str): Directory to write each solution drawn onto its frame to. Defaults to None.
+        sample_fps (float): Frames per second of video to hash.
+        threshold (int): Hash bits two frames may differ in and still count as the same picture.
+        settle (int): Matching samples in a row before a board is detected, so transitions are skipped.
+        timeout (float): Seconds allowed per solve.
+        detector (ColorGridDetector): Detector to use, or a cellDetector.CellSampleDetector
+            for a device with a calibrated profile. Defaults to a new ColorGridDetector.
+
+    Returns:
+        dict: Counts of frames read, frames hashed, detections and levels, plus video
+            and wall-clock seconds.
+    """
+    import cv2
+    from FlowFreePuzzleSolver import FlowFreeSolver
+    from solutionCache import canonical_form
+    from test import ColorGridDetector, square_size
+
+    start = time.perf_counter()
+    counts = {'frames': 0, 'sampled': 0, 'detections': 0, 'levels': 0, 'solved': 0,
+              'video_s': 0.0, 'elapsed_s': 0.0}
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        print(f"Error: Could not open the video at {path}")
+        return counts
+
+    detector = detector or ColorGridDetector()
+    if render_dir:
+        os.makedirs(render_dir, exist_ok=True)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, round(fps / sample_fps))
+
+    previous = None  # hash of the last sampled frame
+    stable = 0  # samples in a row that matched the one before
+    looked_at = None  # hash of the last frame that went through detection
+    level = None  # (rows, cols, set of (color, cell) dots) of the current level
+
+    try:
+        index = -1
+        while True:
+            index += 1
+            if index % step:
+                # grab() skips converting the frame we'd throw away anyway
+                if not capture.grab():
+                    break
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            counts['sampled'] += 1
+
+            current = board_hash(frame)
+            stable = stable + 1 if previous is not None and hash_distance(current, previous) <= threshold else 0
+            previous = current
+            if stable < settle - 1 or (looked_at is not None and hash_distance(current, looked_at) <= threshold):
+                continue
+
+            looked_at = current
+            counts['detections'] += 1
+            color_positions = {color: positions for color, positions in detector.detect_frame(frame)[0].items()
+                               if positions}
+            geometry = detector.geometry
+            dots = {(color, tuple(cell)) for color, cells in color_positions.items() for cell in cells}
+            if level is not None and (geometry.rows, geometry.cols) == level[:2] and dots <= level[2]:
+                # The level being played, perhaps with some colors finished
+                continue
+            if color_positions and geometry.rows != geometry.cols:
+                print(f"Warning: Skipping frame {index}: {geometry.rows}x{geometry.cols} board isn't square",
+                      file=sys.stderr)
+                continue
+            if not color_positions or canonical_form(geometry.rows, color_positions) is None:
+                # Not a whole board
+                continue
+            level = (geometry.rows, geometry.cols, dots)
+
+            counts['levels'] += 1
+            solver = FlowFreeSolver(geometry.rows, color_positions)
+            result = solver.solve_budgeted(timeout=timeout)
+            record = {
+                'level': counts['levels'],
+                'frame': index,
+                'time_s': round(index / fps, 3),
+                'grid_size': geometry.rows,
+                'geometry': list(geometry),
+                'color_positions': color_positions,
+                'status': result.status,
+                'solved': result.status == 'solved',
+                'grid': result.grid,
+                'nodes': result.nodes,
+                'solve_s': result.seconds,
+            }
+            if record['solved']:
+                counts['solved'] += 1
+                if render_dir:
+                    from createImage import render_solution
+
+                    render_path = os.path.join(render_dir, f"level_{counts['levels']:03d}.png")
+                    cv2.imwrite(render_path, render_solution(frame, result.grid, color_positions, geometry))
+                    record['render'] = render_path
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        capture.release()
+
+    counts['frames'] = index
+    counts['video_s'] = index / fps
+    counts['elapsed_s'] = time.perf_counter() - start
+    return counts
+
+
+def check_partly_drawn(first, second, fps=10, seconds=2.0):
+    """
+    Checks that playing a level through doesn't count as new levels.
+
+    Writes a video of the first screenshot, then the same board with two
+    colors drawn in, then fully solved, then the second screenshot, each
+    for the given seconds, and runs process_video over it.
+
+    Args:
+        first (str): Screenshot of an unplayed level.
+        second (str): Screenshot of a different level.
+
+    Returns:
+        bool: True if exactly two levels were found and both solved.
+    """
+    import io
+    import tempfile
+
+    import cv2
+    from createImage import render_solution
+    from FlowFreePuzzleSolver import FlowFreeSolver
+    from test import ColorGridDetector, square_size
+
+    detector = ColorGridDetector()
+    image = cv2.imread(first)
+    color_positions = {color: cells for color, cells in detector.detect_frame(image)[0].items() if cells}
+    solver = FlowFreeSolver(square_size(detector.geometry), color_positions)
+    if not solver.solve():
+        return False
+    drawn = dict(list(color_positions.items())[:2])
+    frames = [
+        image,
+        render_solution(image, solver.grid, drawn, detector.geometry),
+        render_solution(image, solver.grid, color_positions, detector.geometry),
+        cv2.resize(cv2.imread(second), (image.shape[1], image.shape[0])),
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'levels.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (image.shape[1], image.shape[0]))
+        for frame in frames:
+            for _ in range(int(fps * seconds)):
+                writer.write(frame)
+        writer.release()
+        output = io.StringIO()
+        counts = process_video(path, output, sample_fps=fps)
+    return counts['levels'] == 2 and counts['solved'] == 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve every Flow Free level in a screen recording.")
+    parser.add_argument('video', help="Video file")
+    parser.add_argument('-o', '--output', help="JSONL file to write (default: stdout)")
+    parser.add_argument('--render', metavar='DIR', help="Write each solution drawn onto its frame to DIR")
+    parser.add_argument('--sample-fps', type=float, default=5.0, help="Frames per second of video to look at")
+    parser.add_argument('--threshold', type=int, default=12, help="Hash bits frames may differ in and match")
+    parser.add_argument('--settle', type=int, default=2, help="Matching samples before a board is detected")
+    parser.add_argument('--timeout', type=float, default=2.0, help="Seconds allowed per solve")
+    parser.add_argument('--profile', help="Device profile JSON from cellDetector.py calibrate, for cell sampling")
+    args = parser.parse_args(argv)
+
+    detector = None
+    if args.profile:
+        from cellDetector import CellSampleDetector
+
+        with open(args.profile) as f:
+            detector = CellSampleDetector(json.load(f))
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        counts = process_video(args.video, output, render_dir=args.render, sample_fps=args.sample_fps,
+                               threshold=args.threshold, settle=args.settle, timeout=args.timeout,
+                               detector=detector)
+    finally:
+        if args.output:
+            output.close()
+
+    speed = counts['video_s'] / counts['elapsed_s'] if counts['elapsed_s'] else 0
+    print(f"Found {counts['levels']} levels ({counts['solved']} solved) in {counts['frames']} frames, "
+          f"{counts['sampled']} hashed, {counts['detections']} detected; "
+          f"{counts['video_s']:.1f}s of video in {counts['elapsed_s']:.1f}s ({speed:.1f}x real time)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+DEFAULT_SOCKET = os.path.join(os.environ.get('TMPDIR', '/tmp'), 'flowfree-worker.sock')
+
+
+class WarmWorker:
+    """
+    Long-lived process that keeps OpenCV, numpy and the detector tables loaded.
+
+    Jobs are dicts; {'image': path} detects and solves a screenshot,
+    {'image_data': bytes} an encoded screenshot held in memory and
+    {'size': n, 'color_positions': {...}} an already detected board.
+    Optional keys: 'timeout', 'deadline' (a time.monotonic() value), 'node_limit',
+    'ordering', 'backend'.
+    """
+
+    def __init__(self):
+        from FlowFreePuzzleSolver import FlowFreeSolver
+        from test import ColorGridDetector
+
+        self.solver_class = FlowFreeSolver
+        self.detector = ColorGridDetector()
+        # Load the heavy libraries and build the colour table once, up front
+        import cv2
+        self.detector._label_lut()
+        self.jobs = 0
+
+    def handle(self, job):
+        """Runs one job and returns a JSON-ready result dict."""
+        from test import square_size
+
+        start = time.perf_counter()
+        self.jobs += 1
+        try:
+            if 'image' in job:
+                color_positions = self.detector.detect_colors(job['image'])
+                if self.detector.geometry is None:
+                    return {'error': f"could not read {job['image']}"}
+                size = square_size(self.detector.geometry)
+            elif 'image_data' in job:
+                import cv2
+                import numpy as np
+
+                image = cv2.imdecode(np.frombuffer(job['image_data'], dtype=np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    return {'error': "could not decode the image"}
+                color_positions = self.detector.detect_frame(image)[0]
+                size = square_size(self.detector.geometry)
+            else:
+                color_positions = {color: [tuple(p) for p in positions]
+                                   for color, positions in job['color_positions'].items()}
+                size = job['size']
+
+            options = {key: job[key] for key in ('ordering', 'backend') if key in job}
+            solver = self.solver_class(size, color_positions, **options)
+            result = solver.solve_budgeted(timeout=job.get('timeout'), deadline=job.get('deadline'),
+                                           node_limit=job.get('node_limit'))
+            return {
+                'status': result.status,
+                'grid_size': size,
+                'color_positions': color_positions,
+                'grid': result.grid,
+                'nodes': result.nodes,
+                'seconds': time.perf_counter() - start,
+            }
+        except Exception as e:
+            return {'error': str(e)}
+
+    def serve_lines(self, lines, write):
+        """Answers one JSON job per line with one JSON result per line."""
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                result = {'error': f"bad job: {e}"}
+            else:
+                result = self.handle(job)
+            write(json.dumps(result) + "\n")
+
+    def serve_stdin(self):
+        def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        self.serve_lines(sys.stdin, write)
+
+    def serve_socket(self, path=DEFAULT_SOCKET):
+        """Serves connections on a Unix socket, one at a time, until interrupted."""
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen()
+        print(f"Warm worker listening on {path}", file=sys.stderr)
+        try:
+            while True:
+                connection, _ = server.accept()
+                with connection, connection.makefile('r') as reader, connection.makefile('w') as writer:
+                    def write(text):
+                        writer.write(text)
+                        writer.flush()
+
+                    try:
+                        self.serve_lines(reader, write)
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            os.unlink(path)
+
+
+def submit(job, path=DEFAULT_SOCKET):
+    """
+    Sends one job to a worker listening on path and returns its result.
+
+    Only the standard library is imported, so a short-lived client stays cheap.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall((json.dumps(job) + "\n").encode())
+        client.shutdown(socket.SHUT_WR)
+        with client.makefile('r') as reader:
+            return json.loads(reader.readline())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a Flow Free solver warm and feed it jobs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="Serve jobs on a Unix socket")
+    serve.add_argument('--socket', default=DEFAULT_SOCKET)
+    commands.add_parser('stdin', help="Read JSON jobs from stdin, write JSON results to stdout")
+    solve = commands.add_parser('solve', help="Send a screenshot to a running worker")
+    solve.add_argument('image')
+    solve.add_argument('--socket', default=DEFAULT_SOCKET)
+    solve.add_argument('--timeout', type=float)
+    args = parser.parse_args(argv)
+
+    if args.command == 'solve':
+        job = {'image': os.path.abspath(args.image)}
+        if args.timeout is not None:
+            job['timeout'] = args.timeout
+        print(json.dumps(submit(job, args.socket)))
+    elif args.command == 'serve':
+        WarmWorker().serve_socket(args.socket)
+    else:
+        WarmWorker().serve_stdin()
+
+
+if __name__ == "__main__":
+    main()